@@ -0,0 +1,61 @@
+import random
+import numpy as np
+
+# fases sorteadas para a populacao inteira de uma vez
+FASES_GLOBAIS = ('inicial', 'reproducao', 'capacidade_global')
+# fases sorteadas bioma a bioma, cada bioma com o seu gerador
+FASES_POR_BIOMA = ('movimento', 'selecao', 'capacidade', 'reproducao')
+
+
+class FluxosAleatorios():
+    '''
+    todos os geradores aleatorios da simulacao, derivados de uma unica semente
+
+    >>> np.random.SeedSequence(semente).spawn(...) da um fluxo independente para cada fase global
+    e, para cada bioma, um fluxo por fase mais um random.Random (fontes de recurso e cor do bioma).
+    o que acontece num bioma nunca consome numeros de outro bioma ou de outra fase, entao a
+    trajetoria é a mesma nao importa a ordem (ou o processo) em que os biomas sao processados.
+
+    o ultimo "bioma" é o dos individuos fora de qualquer bioma (SEM_BIOMA = -1 indexa o ultimo).
+    sem semente, a entropia sorteada fica em `semente` para a rodada poder ser repetida.
+    '''
+    def __init__(self, semente: int = None, qtd_biomas: int = 0):
+        sequencia = np.random.SeedSequence(semente)
+        self.semente = sequencia.entropy
+
+        filhos = sequencia.spawn(len(FASES_GLOBAIS) + qtd_biomas + 1)
+        self.globais = {
+            fase: np.random.default_rng(filho) for fase, filho in zip(FASES_GLOBAIS, filhos)
+        }
+
+        self.biomas = []
+        self.escalares = []
+        for filho in filhos[len(FASES_GLOBAIS):]:
+            netos = filho.spawn(len(FASES_POR_BIOMA) + 1)
+            self.biomas.append({fase: np.random.default_rng(neto) for fase, neto in zip(FASES_POR_BIOMA, netos)})
+            self.escalares.append(random.Random(int(netos[-1].generate_state(1, np.uint64)[0])))
+
+    def fase(self, nome: str) -> np.random.Generator:
+        return self.globais[nome]
+
+    def bioma(self, indice: int, fase: str) -> np.random.Generator:
+        return self.biomas[indice][fase]
+
+    def estado(self) -> dict:
+        '''estado de todos os geradores, serializavel em json (usado pelo checkpoint)'''
+        return {
+            'semente': str(self.semente),
+            'globais': {fase: rng.bit_generator.state for fase, rng in self.globais.items()},
+            'biomas': [{fase: rng.bit_generator.state for fase, rng in fluxos.items()} for fluxos in self.biomas],
+            'escalares': [rng.getstate() for rng in self.escalares],
+        }
+
+    def restaurar(self, estado: dict):
+        self.semente = int(estado['semente'])
+        for fase, rng in self.globais.items():
+            rng.bit_generator.state = estado['globais'][fase]
+        for fluxos, estados in zip(self.biomas, estado['biomas']):
+            for fase, rng in fluxos.items():
+                rng.bit_generator.state = estados[fase]
+        for rng, (versao, interno, gauss) in zip(self.escalares, estado['escalares']):
+            rng.setstate((versao, tuple(interno), gauss))
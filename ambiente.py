@@ -1,9 +1,12 @@
 import random
-from individuos import Cor, AMBIENTE_X_MAX, AMBIENTE_Y_MAX, QTD_MAX_INDIVIDUOS
+import numpy as np
+from individuos import Cor, SelecaoNatural, AMBIENTE_X_MAX, AMBIENTE_Y_MAX, QTD_MAX_INDIVIDUOS
 
 BRANCO = (255, 255, 255)
 PRETO = (0, 0, 0)
 
+SEM_BIOMA = -1      # indice de bioma para posicoes fora de qualquer bioma
+
 class Bioma():
     def __init__(self, nome: str, proporcao: float, cor: Cor, energia_fornecida: int):
         self.nome = nome
@@ -13,13 +16,33 @@ class Bioma():
         self.limites = None
         self.fontes_de_recurso = []
         self.capacidade_maxima = 0
-        
+        self._chave_tabelas_morte = None
+        self._tabelas_morte = None
+
+    def probabilidade_morte(self, r: np.ndarray, g: np.ndarray, b: np.ndarray, fator_de_pressao: float) -> np.ndarray:
+        '''
+        probabilidade de morte de cada cor (colunas r, g, b de 0 a 255) neste bioma, só com consultas a tabelas
+
+        >>> a distancia ao quadrado ate a cor do bioma é a soma de tres tabelas de 256 posicoes
+        (uma por canal), e a probabilidade sai da tabela de SelecaoNatural indexada por ela, sem raiz
+        nem divisao por individuo. as tabelas sao refeitas só quando a cor do bioma (ou o fator) muda.
+        '''
+        chave = (self.cor.r, self.cor.g, self.cor.b, fator_de_pressao)
+        if self._chave_tabelas_morte != chave:
+            valores = np.arange(256, dtype=np.int32)
+            quadrados = tuple((valores - alvo) ** 2 for alvo in chave[:3])
+            self._tabelas_morte = (*quadrados, SelecaoNatural.tabela_probabilidade_morte(fator_de_pressao))
+            self._chave_tabelas_morte = chave
+        quadrado_r, quadrado_g, quadrado_b, probabilidade = self._tabelas_morte
+        return probabilidade[quadrado_r[r] + quadrado_g[g] + quadrado_b[b]]
+
 class Ambiente():
-    def __init__(self, tamanho_x:int, tamanho_y:int ,biomas:list[Bioma]):
+    def __init__(self, tamanho_x:int, tamanho_y:int ,biomas:list[Bioma], qtd_max_individuos:int = QTD_MAX_INDIVIDUOS):
         self.tamanho_x = tamanho_x
         self.tamanho_y = tamanho_y
         self.biomas = biomas
-
+        self.qtd_max_individuos = qtd_max_individuos
+        self.mapa_biomas = None
             
     def _calcular_limites_biomas(self):
         '''
@@ -88,7 +111,34 @@ class Ambiente():
             area_bioma = largura_bioma * altura_bioma
             
             proporcao_area = area_bioma / area_total_ambiente
-            bioma_atual.capacidade_maxima = int(proporcao_area * QTD_MAX_INDIVIDUOS)
+            bioma_atual.capacidade_maxima = int(proporcao_area * self.qtd_max_individuos)
+
+        self._calcular_mapa_biomas()
+
+    def _calcular_mapa_biomas(self):
+        '''
+        Pre-calcula um raster [y, x] com o indice (em self.biomas) do bioma de cada posicao inteira,
+        assim descobrir o bioma de muitos individuos vira uma unica indexacao.
+        Vai até tamanho_x/tamanho_y inclusive, que sao posicoes validas mas fora de qualquer bioma.
+        '''
+        mapa = np.full((self.tamanho_y + 1, self.tamanho_x + 1), SEM_BIOMA, dtype=np.int8)
+        for indice, bioma in reversed(list(enumerate(self.biomas))):
+            lim = bioma.limites
+            mapa[lim['y_inicio']:lim['y_fim'] + 1, lim['x_inicio']:lim['x_fim'] + 1] = indice
+        self.mapa_biomas = mapa
+
+    def biomas_em_lote(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        '''indice em self.biomas do bioma de cada posicao (SEM_BIOMA se nao estiver em nenhum)'''
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        altura, largura = self.mapa_biomas.shape
+        dentro = (xs >= 0) & (xs < largura) & (ys >= 0) & (ys < altura)
+        if dentro.all():
+            return self.mapa_biomas[ys, xs]
+
+        indices = np.full(len(xs), SEM_BIOMA, dtype=np.int8)
+        indices[dentro] = self.mapa_biomas[ys[dentro], xs[dentro]]
+        return indices
 
     def mostrar(self):
         print(f'Ambiente com tamanho [{self.tamanho_x}, {self.tamanho_y}]')
@@ -111,13 +161,13 @@ class FonteDeRecurso:
         self.raio = raio
         self.energia_fornecida = energia_fornecida
         
-    def mover(self, limites_bioma: dict, intensidade_movimento: int):
+    def mover(self, limites_bioma: dict, intensidade_movimento: int, rng=random):
         '''
         mova a fonte de recurso aleatoriamente dentro dos limites de seu bioma
         ''' 
 
-        mov_x = random.randint(-intensidade_movimento, intensidade_movimento)
-        mov_y = random.randint(-intensidade_movimento, intensidade_movimento)
+        mov_x = rng.randint(-intensidade_movimento, intensidade_movimento)
+        mov_y = rng.randint(-intensidade_movimento, intensidade_movimento)
         
         self.x += mov_x
         self.y += mov_y
@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+from espacial import encontrar_pares
+from individuos import DISTANCIA_REPRODUCAO, CUSTO_REPRODUCAO
+from registro import RegistradorColunar
+from simulacao import Simulacao, Configuracao, IDADE_REPRODUTIVA
+
+try:
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    import pygame
+    import main as visualizador
+except ImportError:
+    pygame = None
+
+TAMANHOS_POPULACAO = [5_000, 50_000, 500_000]
+TAMANHOS_FASES = [1_000, 5_000, 50_000, 500_000]
+ANOS_POR_TAMANHO = 10
+PERCENTIS = (50, 90, 99)
+ARQUIVO_RESULTADOS = 'benchmark_resultados.json'
+
+
+def encontrar_pares_ingenuo(xs, ys, distancia: float) -> list[tuple[int, int]]:
+    '''busca de parceiro original, O(n²), usada como referencia'''
+    ja_reproduziu = set()
+    pares = []
+    for a in range(len(xs)):
+        if a in ja_reproduziu:
+            continue
+        for b in range(len(xs)):
+            if a != b and b not in ja_reproduziu:
+                if (xs[a] - xs[b])**2 + (ys[a] - ys[b])**2 <= distancia**2:
+                    ja_reproduziu.add(a)
+                    ja_reproduziu.add(b)
+                    pares.append((a, b))
+                    break
+    return pares
+
+
+def cronometrar(funcao, *args) -> float:
+    inicio = time.perf_counter()
+    funcao(*args)
+    return time.perf_counter() - inicio
+
+
+def benchmark_reproducao(tamanhos: list[int], limite_ingenuo: int):
+    '''tempo da busca de parceiros e de um ano completo para cada tamanho de populacao'''
+
+    print(f"{'individuos':>10} | {'aptos':>8} | {'pares (grade)':>13} | {'pares (O(n²))':>13} | {'ano completo':>12}")
+    print('-' * 70)
+    for tamanho in tamanhos:
+        simulacao = Simulacao(qtd_inicial=tamanho, semente=0)
+
+        populacao = simulacao.populacao
+        aptos = np.flatnonzero(
+            (populacao.idade >= IDADE_REPRODUTIVA) & (populacao.energia >= CUSTO_REPRODUCAO)
+        )
+        simulacao.aleatorio.fase('reproducao').shuffle(aptos)
+        xs = populacao.x[aptos].tolist()
+        ys = populacao.y[aptos].tolist()
+
+        tempo_grade = cronometrar(encontrar_pares, xs, ys, DISTANCIA_REPRODUCAO)
+        if len(aptos) <= limite_ingenuo:
+            tempo_ingenuo = f'{cronometrar(encontrar_pares_ingenuo, xs, ys, DISTANCIA_REPRODUCAO):12.3f}s'
+        else:
+            tempo_ingenuo = f"{'-':>13}"
+
+        tempo_ano = cronometrar(simulacao.step)
+
+        print(f'{tamanho:>10} | {len(aptos):>8} | {tempo_grade:12.3f}s | {tempo_ingenuo} | {tempo_ano:11.3f}s')
+
+
+# --- SUITE POR FASE ---
+
+def _medir_fases(tamanho: int, anos: int, semente: int, desenhar: bool) -> dict:
+    '''
+    roda `anos` anos com `tamanho` individuos iniciais medindo cada fase separadamente.
+    a capacidade maxima acompanha o tamanho, senao o controle de capacidade derrubaria tudo para 5000 no 1º ano.
+    '''
+    config = Configuracao(qtd_inicial_individuos=tamanho, qtd_max_individuos=tamanho)
+    simulacao = Simulacao(config=config, semente=semente)
+
+    tempos = {nome: [] for nome, _ in simulacao.fases()}
+    tempos['log'] = []
+    if desenhar:
+        tempos['desenho'] = []
+        tela = pygame.Surface((visualizador.LARGURA_TELA, visualizador.ALTURA_TELA))
+        camera = visualizador.Camera()
+
+    tamanhos_populacao = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        registrador = RegistradorColunar(os.path.join(diretorio, 'log.bin'),
+                                         [bioma.nome for bioma in simulacao.ambiente.biomas])
+        for _ in range(anos):
+            if simulacao.extinta:
+                break
+            tamanhos_populacao.append(len(simulacao.populacao))
+
+            for nome, fase in simulacao.fases():
+                tempos[nome].append(cronometrar(fase))
+            simulacao.ano += 1
+
+            tempos['log'].append(cronometrar(registrador, simulacao))
+
+            if desenhar:
+                inicio = time.perf_counter()
+                visualizador.desenhar_ambiente(tela, simulacao.ambiente, camera)
+                visualizador.desenhar_fontes_recurso(tela, simulacao.ambiente, camera)
+                visualizador.desenhar_populacao(tela, simulacao.populacao, camera)
+                tempos['desenho'].append(time.perf_counter() - inicio)
+        registrador.fechar()
+
+    nomes_simulacao = [nome for nome, _ in simulacao.fases()]
+    tempo_ano = np.sum([tempos[nome] for nome in nomes_simulacao], axis=0)
+    tempo_total = tempo_ano + np.sum([tempos[nome] for nome in tempos if nome not in nomes_simulacao], axis=0)
+
+    return {
+        'tamanho': tamanho,
+        'anos': len(tamanhos_populacao),
+        'populacao_media': float(np.mean(tamanhos_populacao)) if tamanhos_populacao else 0.0,
+        'anos_por_segundo': float(len(tempo_ano) / tempo_ano.sum()) if len(tempo_ano) else 0.0,
+        'anos_por_segundo_com_log_e_desenho': float(len(tempo_total) / tempo_total.sum()) if len(tempo_total) else 0.0,
+        'fases': {
+            nome: {f'p{p}_ms': float(np.percentile(valores, p) * 1000) for p in PERCENTIS}
+            for nome, valores in tempos.items() if valores
+        },
+    }
+
+
+def _versao_codigo() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecida'
+
+
+def benchmark_fases(tamanhos: list[int], anos: int, semente: int = 0, desenhar: bool = True) -> dict:
+    '''mede cada fase do ano para cada tamanho de populacao e retorna os resultados prontos para salvar'''
+    desenhar = desenhar and pygame is not None
+
+    resultados = {
+        'versao': _versao_codigo(),
+        'data': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'maquina': platform.machine(),
+        'tamanhos': [],
+    }
+    for tamanho in tamanhos:
+        medicao = _medir_fases(tamanho, anos, semente, desenhar)
+        resultados['tamanhos'].append(medicao)
+        mostrar_medicao(medicao)
+    return resultados
+
+
+def mostrar_medicao(medicao: dict, anterior: dict = None):
+    print(f"\n{medicao['tamanho']} individuos iniciais | {medicao['anos']} anos | "
+          f"populacao media {medicao['populacao_media']:.0f} | "
+          f"{medicao['anos_por_segundo']:.1f} anos/s ({medicao['anos_por_segundo_com_log_e_desenho']:.1f} com log e desenho)")
+    print(f"  {'fase':<12}" + ''.join(f'{f"p{p} (ms)":>12}' for p in PERCENTIS) + ('   vs anterior (p50)' if anterior else ''))
+    for nome, estatisticas in medicao['fases'].items():
+        linha = f'  {nome:<12}' + ''.join(f"{estatisticas[f'p{p}_ms']:12.2f}" for p in PERCENTIS)
+        if anterior and nome in anterior['fases'] and anterior['fases'][nome]['p50_ms'] > 0:
+            razao = estatisticas['p50_ms'] / anterior['fases'][nome]['p50_ms']
+            linha += f'   {razao:6.2f}x'
+        print(linha)
+
+
+def comparar(resultados: dict, anteriores: dict):
+    '''mostra cada tamanho ao lado da execucao anterior, razao > 1 = ficou mais lento'''
+    print(f"\n=== comparando {resultados['versao']} com {anteriores['versao']} ({anteriores['data']}) ===")
+    por_tamanho = {medicao['tamanho']: medicao for medicao in anteriores['tamanhos']}
+    for medicao in resultados['tamanhos']:
+        mostrar_medicao(medicao, por_tamanho.get(medicao['tamanho']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks da simulacao.')
+    parser.add_argument('--reproducao', action='store_true',
+                        help='mede só a busca de parceiros (grade x O(n²)) em vez da suite por fase')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=None)
+    parser.add_argument('--anos', type=int, default=ANOS_POR_TAMANHO, help='anos medidos por tamanho')
+    parser.add_argument('--sem-desenho', action='store_true', help='nao mede a fase de desenho (pygame)')
+    parser.add_argument('--limite-ingenuo', type=int, default=5_000,
+                        help='maior numero de aptos em que a busca O(n²) tambem é medida')
+    parser.add_argument('--saida', default=ARQUIVO_RESULTADOS, help='onde salvar os resultados (json)')
+    parser.add_argument('--comparar', default=None, metavar='JSON',
+                        help='resultados de uma versao anterior para comparar')
+    args = parser.parse_args()
+
+    if args.reproducao:
+        benchmark_reproducao(args.tamanhos or TAMANHOS_POPULACAO, args.limite_ingenuo)
+    else:
+        resultados = benchmark_fases(args.tamanhos or TAMANHOS_FASES, args.anos, desenhar=not args.sem_desenho)
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+        print(f'\nresultados salvos em {args.saida}')
+
+        if args.comparar:
+            with open(args.comparar, encoding='utf-8') as arquivo:
+                comparar(resultados, json.load(arquivo))
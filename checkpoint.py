@@ -0,0 +1,135 @@
+import json
+import os
+import numpy as np
+from ambiente import Ambiente, Bioma, Cor, FonteDeRecurso
+from genealogia import Genealogia, COLUNAS_GENEALOGIA
+from populacao import COLUNAS
+from simulacao import Simulacao, Configuracao
+
+VERSAO_CHECKPOINT = 3
+
+
+def salvar_checkpoint(simulacao: Simulacao, caminho: str):
+    '''
+    Grava o estado completo da simulacao num .npz (sem compressao, para ser rapido):
+    colunas da populacao, o proximo id (ContadorIds), biomas (cor, limites, capacidade), fontes de recurso,
+    estado de todos os fluxos aleatorios (FluxosAleatorios), ano e configuracao
+    (e a genealogia, se estiver ligada).
+
+    O arquivo é escrito ao lado e renomeado no fim, entao um processo que morre no meio
+    da gravacao nunca deixa um checkpoint corrompido no lugar do anterior.
+    '''
+    ambiente = simulacao.ambiente
+    populacao = simulacao.populacao
+
+    meta = {
+        'versao': VERSAO_CHECKPOINT,
+        'ano': simulacao.ano,
+        'id_counter': simulacao.ids.proximo,
+        'config': simulacao.config.como_dict(),
+        'ambiente': {
+            'tamanho_x': ambiente.tamanho_x,
+            'tamanho_y': ambiente.tamanho_y,
+            'qtd_max_individuos': ambiente.qtd_max_individuos,
+            'biomas': [bioma.nome for bioma in ambiente.biomas],
+        },
+        'aleatorio': simulacao.aleatorio.estado(),
+    }
+
+    fontes = [
+        (indice, fonte.x, fonte.y, fonte.raio, fonte.energia_fornecida)
+        for indice, bioma in enumerate(ambiente.biomas)
+        for fonte in bioma.fontes_de_recurso
+    ]
+
+    arrays = {f'populacao_{nome}': getattr(populacao, nome) for nome in COLUNAS}
+    if simulacao.genealogia is not None:
+        meta['genealogia'] = {'intervalo_poda': simulacao.genealogia.intervalo_poda}
+        arrays.update({f'genealogia_{nome}': simulacao.genealogia.coluna(nome) for nome in COLUNAS_GENEALOGIA})
+    arrays.update(
+        biomas_cor=np.array([[b.cor.r, b.cor.g, b.cor.b] for b in ambiente.biomas], dtype=np.int64),
+        biomas_limites=np.array(
+            [[b.limites['x_inicio'], b.limites['x_fim'], b.limites['y_inicio'], b.limites['y_fim']] for b in ambiente.biomas],
+            dtype=np.int64,
+        ),
+        biomas_proporcao=np.array([b.proporcao for b in ambiente.biomas]),
+        biomas_energia=np.array([b.energia_fornecida for b in ambiente.biomas], dtype=np.int64),
+        biomas_capacidade=np.array([b.capacidade_maxima for b in ambiente.biomas], dtype=np.int64),
+        fontes=np.array(fontes, dtype=np.float64).reshape(-1, 5),
+        meta=np.array(json.dumps(meta)),
+    )
+
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as arquivo:
+        np.savez(arquivo, **arrays)
+    os.replace(temporario, caminho)
+
+
+def carregar_checkpoint(caminho: str, classe: type = Simulacao, **parametros) -> Simulacao:
+    '''
+    Recria a Simulacao exatamente no estado gravado, pronta para continuar com step()/run().
+    `classe` pode ser uma subclasse, criada com os `parametros` extras (ex.: SimulacaoFragmentada, processos=4).
+    '''
+    with np.load(caminho) as dados:
+        meta = json.loads(str(dados['meta']))
+        if meta['versao'] != VERSAO_CHECKPOINT:
+            raise ValueError(f"checkpoint na versao {meta['versao']}, esperado {VERSAO_CHECKPOINT}")
+
+        biomas = []
+        for indice, nome in enumerate(meta['ambiente']['biomas']):
+            bioma = Bioma(nome, float(dados['biomas_proporcao'][indice]), Cor(*dados['biomas_cor'][indice].tolist()),
+                          energia_fornecida=int(dados['biomas_energia'][indice]))
+            x_inicio, x_fim, y_inicio, y_fim = dados['biomas_limites'][indice].tolist()
+            bioma.limites = {'x_inicio': x_inicio, 'x_fim': x_fim, 'y_inicio': y_inicio, 'y_fim': y_fim}
+            bioma.capacidade_maxima = int(dados['biomas_capacidade'][indice])
+            biomas.append(bioma)
+
+        for indice, x, y, raio, energia in dados['fontes'].tolist():
+            biomas[int(indice)].fontes_de_recurso.append(FonteDeRecurso(int(x), int(y), int(raio), int(energia)))
+
+        ambiente = Ambiente(meta['ambiente']['tamanho_x'], meta['ambiente']['tamanho_y'], biomas,
+                            qtd_max_individuos=meta['ambiente']['qtd_max_individuos'])
+        ambiente._calcular_mapa_biomas()
+
+        # o construtor monta o resto (mutacao, observadores, ...) e depois o estado salvo é reposto por cima
+        simulacao = classe(ambiente=ambiente, qtd_inicial=0, config=Configuracao(**meta['config']), **parametros)
+
+        # a populacao vazia do construtor recebe as linhas (e continua sendo do tipo que a classe usa)
+        simulacao.populacao.adicionar(**{nome: dados[f'populacao_{nome}'] for nome in COLUNAS})
+
+        if 'genealogia' in meta:
+            genealogia = Genealogia(capacidade=len(dados['genealogia_id']),
+                                    intervalo_poda=meta['genealogia']['intervalo_poda'])
+            genealogia.registrar(*(dados[f'genealogia_{nome}'] for nome in COLUNAS_GENEALOGIA))
+            simulacao.genealogia = genealogia
+
+    simulacao.aleatorio.restaurar(meta['aleatorio'])
+    simulacao.ano = meta['ano']
+    simulacao.ids.proximo = meta['id_counter']
+    return simulacao
+
+
+class CheckpointPeriodico():
+    '''
+    observador da Simulacao que grava um checkpoint a cada `intervalo` anos em `diretorio`
+    (checkpoint_000100.npz, checkpoint_000200.npz, ...), guardando só os `manter` mais recentes
+    '''
+    def __init__(self, diretorio: str, intervalo: int, manter: int = 3):
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.manter = manter
+        self.gravados = []
+        os.makedirs(diretorio, exist_ok=True)
+
+    def __call__(self, simulacao: Simulacao):
+        if simulacao.ano % self.intervalo != 0:
+            return
+
+        caminho = os.path.join(self.diretorio, f'checkpoint_{simulacao.ano:06d}.npz')
+        salvar_checkpoint(simulacao, caminho)
+        self.gravados.append(caminho)
+
+        while self.manter and len(self.gravados) > self.manter:
+            antigo = self.gravados.pop(0)
+            if os.path.exists(antigo):
+                os.remove(antigo)
@@ -0,0 +1,185 @@
+import math
+from bisect import bisect_right
+from collections import defaultdict
+import numpy as np
+
+
+class GradeEspacial():
+    '''
+    indice espacial de grade uniforme
+
+    >>> divide o mundo em celulas quadradas de lado `tamanho_celula` e guarda, em cada celula,
+    os indices dos pontos que caem nela. uma busca por raio só precisa olhar as celulas vizinhas
+    em vez da populacao inteira.
+
+    os indices de cada celula ficam em ordem crescente (a ordem em que os pontos foram inseridos).
+    '''
+    def __init__(self, tamanho_celula: float):
+        self.tamanho_celula = tamanho_celula
+        self.celulas = {}
+        self._cache_deslocamentos = {}
+
+    def _celula(self, x, y) -> tuple[int, int]:
+        return (int(x // self.tamanho_celula), int(y // self.tamanho_celula))
+
+    def construir(self, xs, ys):
+        '''reconstroi o indice a partir das listas de coordenadas, o indice de cada ponto é sua posicao nelas'''
+        celulas = defaultdict(list)
+        for i, (x, y) in enumerate(zip(xs, ys)):
+            celulas[self._celula(x, y)].append(i)
+        self.celulas = dict(celulas)
+
+    def _deslocamentos(self, alcance: int) -> list[tuple[int, int]]:
+        '''deslocamentos de celula ate `alcance`, dos mais proximos (a propria celula) para os mais distantes'''
+        if alcance not in self._cache_deslocamentos:
+            deslocamentos = [
+                (dx, dy)
+                for dx in range(-alcance, alcance + 1)
+                for dy in range(-alcance, alcance + 1)
+            ]
+            deslocamentos.sort(key=lambda d: abs(d[0]) + abs(d[1]))
+            self._cache_deslocamentos[alcance] = deslocamentos
+        return self._cache_deslocamentos[alcance]
+
+    def chaves_vizinhas(self, x, y, raio: float = None) -> list[tuple[int, int]]:
+        '''chaves das celulas ocupadas que podem conter pontos a até `raio` de (x, y), da mais proxima para a mais distante'''
+        if raio is None:
+            raio = self.tamanho_celula
+        alcance = max(1, math.ceil(raio / self.tamanho_celula))
+        cx, cy = self._celula(x, y)
+
+        vizinhas = []
+        for dx, dy in self._deslocamentos(alcance):
+            if (cx + dx, cy + dy) in self.celulas:
+                vizinhas.append((cx + dx, cy + dy))
+        return vizinhas
+
+    def celulas_vizinhas(self, x, y, raio: float = None) -> list[list[int]]:
+        '''listas de indices das celulas que podem conter pontos a até `raio` de (x, y)'''
+        return [self.celulas[chave] for chave in self.chaves_vizinhas(x, y, raio)]
+
+    def consultar_raio(self, x, y, raio: float, xs, ys) -> list[int]:
+        '''indices de todos os pontos a distancia <= raio de (x, y)'''
+        raio_sq = raio**2
+        encontrados = []
+        for lista in self.celulas_vizinhas(x, y, raio):
+            for j in lista:
+                if (xs[j] - x)**2 + (ys[j] - y)**2 <= raio_sq:
+                    encontrados.append(j)
+        return encontrados
+
+
+def pontos_nos_circulos(xs, ys, centros_x, centros_y, raios) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    todos os pares (circulo, ponto) com o ponto a distancia <= raio do centro do circulo, em ordem de circulo
+
+    >>> a mesma ideia da GradeEspacial, mas em lote com numpy: os pontos sao ordenados pela chave
+    da celula (lado = maior raio) e cada circulo só olha os intervalos das 3x3 celulas em volta
+    do centro. o custo acompanha quantos pontos estao perto de algum circulo, nao pontos x circulos,
+    e mover os circulos nao custa nada (só os pontos sao indexados).
+    '''
+    xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+    centros_x, centros_y = np.asarray(centros_x, dtype=np.int64), np.asarray(centros_y, dtype=np.int64)
+    raios = np.asarray(raios)
+    if len(xs) == 0 or len(centros_x) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    tamanho_celula = max(1, math.ceil(raios.max()))
+    celula_x, celula_y = xs // tamanho_celula, ys // tamanho_celula
+    centro_cx, centro_cy = centros_x // tamanho_celula, centros_y // tamanho_celula
+    # celulas renumeradas a partir de 1 antes da menor, para os vizinhos dos centros tambem terem chave valida
+    base_x = min(celula_x.min(), centro_cx.min()) - 1
+    base_y = min(celula_y.min(), centro_cy.min()) - 1
+    colunas = max(celula_x.max(), centro_cx.max()) - base_x + 2
+
+    chaves = (celula_x - base_x) + (celula_y - base_y) * colunas
+    ordem = np.argsort(chaves, kind='stable')
+    chaves = chaves[ordem]
+
+    # uma linha por circulo, uma coluna por celula vizinha
+    deslocamentos = np.arange(-1, 2)
+    vizinhas = (
+        (centro_cx - base_x)[:, None, None] + deslocamentos[None, None, :]
+        + ((centro_cy - base_y)[:, None, None] + deslocamentos[None, :, None]) * colunas
+    ).reshape(len(centros_x), -1)
+    inicio = np.searchsorted(chaves, vizinhas, side='left').ravel()
+    quantidades = np.searchsorted(chaves, vizinhas, side='right').ravel() - inicio
+    total = int(quantidades.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # junta os intervalos [inicio, inicio + quantidade) de todas as celulas num só array de posicoes
+    posicoes = np.repeat(inicio - np.concatenate(([0], np.cumsum(quantidades)[:-1])), quantidades)
+    posicoes += np.arange(total)
+    circulos = np.repeat(np.arange(len(centros_x)), vizinhas.shape[1])
+    circulos = np.repeat(circulos, quantidades)
+    pontos = ordem[posicoes]
+
+    dx, dy = xs[pontos] - centros_x[circulos], ys[pontos] - centros_y[circulos]
+    dentro = dx * dx + dy * dy <= raios[circulos] ** 2
+    return circulos[dentro], pontos[dentro]
+
+
+def _proximo_livre(proximo: list[int], pos: int) -> int:
+    '''segue os saltos de `proximo` ate uma posicao livre, comprimindo o caminho'''
+    raiz = pos
+    while proximo[raiz] != raiz:
+        raiz = proximo[raiz]
+    while proximo[pos] != raiz:
+        proximo[pos], pos = raiz, proximo[pos]
+    return raiz
+
+
+def encontrar_pares(xs, ys, distancia: float) -> list[tuple[int, int]]:
+    '''
+    Forma os casais para reproducao, usando uma grade com celulas do tamanho de `distancia`.
+
+    Mantem a mesma regra da busca O(n²) original: percorrendo os pontos na ordem dada, cada um que
+    ainda nao reproduziu fica com o PRIMEIRO ponto (na mesma ordem) livre e a distancia <= `distancia`.
+
+    Pontos anteriores a `a` nunca sao candidatos validos para `a`: quando chegou a vez deles, se
+    estivessem livres e perto de `a` teriam formado par com ele. Por isso basta procurar, em cada
+    celula vizinha, o primeiro indice livre depois de `a`.
+    '''
+    grade = GradeEspacial(distancia)
+    grade.construir(xs, ys)
+    distancia_sq = distancia**2
+
+    # as celulas sao enfileiradas numa lista unica, cada uma num intervalo [inicio, fim).
+    # `proximo` pula direto os que ja reproduziram, senao as celulas cheias viram O(n²) de novo
+    ordem = []
+    intervalos = {}
+    for chave, lista in grade.celulas.items():
+        intervalos[chave] = (len(ordem), len(ordem) + len(lista))
+        ordem.extend(lista)
+    posicao_de = [0] * len(xs)
+    for pos, i in enumerate(ordem):
+        posicao_de[i] = pos
+    proximo = list(range(len(ordem) + 1))
+
+    pares = []
+    for a in range(len(xs)):
+        pos_a = posicao_de[a]
+        if proximo[pos_a] != pos_a:
+            continue
+
+        xa, ya = xs[a], ys[a]
+        parceiro = None
+        for chave in grade.chaves_vizinhas(xa, ya):
+            inicio, fim = intervalos[chave]
+            pos = _proximo_livre(proximo, bisect_right(ordem, a, inicio, fim))
+            while pos < fim:
+                b = ordem[pos]
+                if parceiro is not None and b > parceiro:
+                    break
+                if (xa - xs[b])**2 + (ya - ys[b])**2 <= distancia_sq:
+                    parceiro = b
+                    break
+                pos = _proximo_livre(proximo, pos + 1)
+
+        if parceiro is not None:
+            proximo[pos_a] = pos_a + 1
+            proximo[posicao_de[parceiro]] = posicao_de[parceiro] + 1
+            pares.append((a, parceiro))
+
+    return pares
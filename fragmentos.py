@@ -0,0 +1,230 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from ambiente import Ambiente, SEM_BIOMA
+from individuos import Cor, Mutacao
+from populacao import Populacao, COLUNAS
+from simulacao import (
+    Simulacao, Configuracao, alimentar_populacao, mover_populacao, reproduzir_no_bioma, cria_mutacao,
+)
+
+
+class PopulacaoCompartilhada(Populacao):
+    '''
+    Populacao com as colunas em memoria compartilhada (multiprocessing.shared_memory)
+
+    >>> os processos de trabalho abrem os mesmos blocos pelo nome (descritor()) e leem/escrevem
+    as colunas direto, sem copiar a populacao a cada tarefa.
+
+    quando a capacidade cresce, cada coluna ganha um bloco novo e o antigo é liberado,
+    o descritor muda junto e os trabalhadores reabrem os blocos na proxima tarefa.
+    '''
+    def __init__(self, capacidade: int = 1024):
+        self._blocos = {}
+        self._antigos = []
+        super().__init__(capacidade)
+
+    @classmethod
+    def copiar_de(cls, populacao: Populacao) -> 'PopulacaoCompartilhada':
+        compartilhada = cls(capacidade=populacao.capacidade)
+        compartilhada.adicionar(**{nome: getattr(populacao, nome) for nome in COLUNAS})
+        return compartilhada
+
+    def _nova_coluna(self, nome: str, capacidade: int, tipo) -> np.ndarray:
+        bloco = shared_memory.SharedMemory(create=True, size=capacidade * np.dtype(tipo).itemsize)
+        if nome in self._blocos:
+            # o nome some na hora (o conteudo continua acessivel ate a copia para o bloco novo)
+            self._blocos[nome].unlink()
+            self._antigos.append(self._blocos[nome])
+        self._blocos[nome] = bloco
+        coluna = np.ndarray(capacidade, dtype=tipo, buffer=bloco.buf)
+        coluna[:] = 0
+        return coluna
+
+    def _garantir_capacidade(self, necessaria: int):
+        super()._garantir_capacidade(necessaria)
+        self._liberar_antigos()
+
+    def _liberar_antigos(self):
+        # o mapeamento só fecha quando ninguem mais tiver uma view do bloco, senao fica para a proxima
+        pendentes = []
+        for bloco in self._antigos:
+            try:
+                bloco.close()
+            except BufferError:
+                pendentes.append(bloco)
+        self._antigos = pendentes
+
+    def descritor(self) -> dict:
+        '''o que um outro processo precisa para abrir as colunas'''
+        return {
+            'tamanho': self.tamanho,
+            'capacidade': self.capacidade,
+            'blocos': {nome: bloco.name for nome, bloco in self._blocos.items()},
+        }
+
+    def liberar(self):
+        '''libera todos os blocos (a populacao nao pode mais ser usada depois disso)'''
+        for bloco in self._blocos.values():
+            bloco.unlink()
+        self._antigos.extend(self._blocos.values())
+        self._blocos = {}
+        self._dados = {}
+        self.tamanho = 0
+        self._liberar_antigos()
+
+
+# --- LADO DOS PROCESSOS DE TRABALHO ---
+
+_ambiente: Ambiente = None
+_config: Configuracao = None
+_mutacao: Mutacao = None
+_abertos: dict[str, shared_memory.SharedMemory] = {}
+
+
+def _iniciar_trabalhador(ambiente: Ambiente, config: Configuracao):
+    global _ambiente, _config, _mutacao
+    _ambiente = ambiente    # só o mapa de biomas e as tabelas de morte sao usados, cores e fontes vem em cada tarefa
+    _config = config
+    _mutacao = cria_mutacao(config)
+
+
+def _abrir_populacao(descritor: dict) -> Populacao:
+    '''Populacao cujas colunas sao views dos blocos compartilhados do processo principal'''
+    nomes = set(descritor['blocos'].values())
+    for nome in list(_abertos):
+        if nome not in nomes:
+            try:
+                _abertos.pop(nome).close()
+            except BufferError:
+                pass
+    for nome in nomes - set(_abertos):
+        _abertos[nome] = shared_memory.SharedMemory(name=nome)
+
+    populacao = Populacao.sobre_colunas({
+        coluna: np.ndarray(descritor['capacidade'], dtype=COLUNAS[coluna], buffer=_abertos[nome].buf)
+        for coluna, nome in descritor['blocos'].items()
+    })
+    populacao.tamanho = descritor['tamanho']
+    return populacao
+
+
+def _gerador(estado: dict) -> np.random.Generator:
+    rng = np.random.default_rng()
+    rng.bit_generator.state = estado
+    return rng
+
+
+def _tarefa_alimentacao(descritor: dict, linhas: np.ndarray, fontes: list):
+    alimentar_populacao(_abrir_populacao(descritor), fontes, _config.energia_maxima, linhas)
+
+
+def _tarefa_movimento(descritor: dict, linhas: np.ndarray, estado_rng: dict, limites: tuple) -> dict:
+    populacao = _abrir_populacao(descritor)
+    rng = _gerador(estado_rng)
+    mover_populacao(populacao, rng, _config, linhas, limites)
+    populacao.bioma[linhas] = _ambiente.biomas_em_lote(populacao.x[linhas], populacao.y[linhas])
+    return rng.bit_generator.state
+
+
+def _tarefa_selecao(descritor: dict, linhas: np.ndarray, indice: int, cor_alvo: list,
+                    estado_rng: dict) -> tuple[dict, np.ndarray]:
+    populacao = _abrir_populacao(descritor)
+    rng = _gerador(estado_rng)
+    # a copia local do bioma recebe a cor atual, as tabelas dele só sao refeitas se ela mudou
+    bioma = _ambiente.biomas[indice]
+    bioma.cor = Cor(*cor_alvo)
+    probabilidade_morte = bioma.probabilidade_morte(
+        populacao.r[linhas], populacao.g[linhas], populacao.b[linhas], _config.fator_sobrevivencia,
+    )
+    sobrevive = rng.random(len(linhas)) > probabilidade_morte
+    return rng.bit_generator.state, sobrevive
+
+
+def _tarefa_reproducao(descritor: dict, linhas: np.ndarray, indice: int, estado_rng: dict) -> tuple:
+    rng = _gerador(estado_rng)
+    resultado = reproduzir_no_bioma(_abrir_populacao(descritor), linhas, _ambiente.biomas[indice].limites,
+                                    rng, _config, _mutacao)
+    return (rng.bit_generator.state, *resultado)
+
+
+# --- PROCESSO PRINCIPAL ---
+
+class SimulacaoFragmentada(Simulacao):
+    '''
+    Simulacao que divide as fases por bioma entre processos
+
+    >>> alimentacao, movimento (com o bioma novo de cada um), selecao e reproducao (busca de par e
+    cruzamento) rodam em paralelo, uma tarefa por bioma, sobre a populacao em memoria compartilhada.
+    o fragmento de cada bioma é refeito a partir da coluna `bioma` antes de cada fase: quem cruzou
+    a fronteira no movimento já cai no fragmento do bioma novo na selecao.
+
+    na reproducao cada tarefa devolve os casais e os filhos do seu bioma e os aptos sem par perto
+    da borda; o processo principal forma os casais entre fragmentos só com essas sobras (essa é a
+    troca entre fragmentos). morte/capacidade ficam no processo principal, que tambem é o unico
+    que compacta ou aumenta a populacao. cada tarefa recebe o estado do fluxo aleatorio do seu
+    bioma e devolve o estado avancado, entao a trajetoria é identica à da Simulacao com a mesma semente.
+
+    os processos só compensam com populacoes grandes; use como context manager (ou chame fechar()).
+    '''
+    def __init__(self, *args, processos: int = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.populacao = PopulacaoCompartilhada.copiar_de(self.populacao)
+        self.processos = processos if processos is not None else min(len(self.ambiente.biomas), os.cpu_count())
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processos, initializer=_iniciar_trabalhador, initargs=(self.ambiente, self.config),
+        )
+
+    def fechar(self):
+        self._executor.shutdown()
+        self.populacao.liberar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def _em_paralelo(self, tarefa, argumentos: list[tuple]) -> list:
+        '''roda `tarefa(descritor, *args)` para cada args, os resultados voltam na ordem dos argumentos'''
+        descritor = self.populacao.descritor()
+        futuros = [self._executor.submit(tarefa, descritor, *args) for args in argumentos]
+        return [futuro.result() for futuro in futuros]
+
+    def _fase_alimentacao(self):
+        '''1. Envelhecer e alimentar a população'''
+        fontes = self._fontes()
+        self._em_paralelo(_tarefa_alimentacao, [(linhas, fontes) for _, linhas in self._linhas_por_bioma()])
+
+    def _mover_por_bioma(self, grupos: list[tuple[int, np.ndarray]]):
+        estados = self._em_paralelo(_tarefa_movimento, [
+            (linhas, self.aleatorio.bioma(indice, 'movimento').bit_generator.state, self.limites_movimento)
+            for indice, linhas in grupos
+        ])
+        for (indice, _), estado in zip(grupos, estados):
+            self.aleatorio.bioma(indice, 'movimento').bit_generator.state = estado
+
+    def _sobreviventes_por_bioma(self, grupos: list[tuple[int, np.ndarray]]) -> np.ndarray:
+        grupos = [(indice, linhas) for indice, linhas in grupos if indice != SEM_BIOMA]
+        resultados = self._em_paralelo(_tarefa_selecao, [
+            (linhas, indice, [self.ambiente.biomas[indice].cor.r, self.ambiente.biomas[indice].cor.g,
+                      self.ambiente.biomas[indice].cor.b],
+             self.aleatorio.bioma(indice, 'selecao').bit_generator.state)
+            for indice, linhas in grupos
+        ])
+
+        sobrevive = np.zeros(len(self.populacao), dtype=bool)
+        for (indice, linhas), (estado, sobrevive_bioma) in zip(grupos, resultados):
+            self.aleatorio.bioma(indice, 'selecao').bit_generator.state = estado
+            sobrevive[linhas] = sobrevive_bioma
+        return sobrevive
+
+    def _reproduzir_por_bioma(self, grupos: list[tuple[int, np.ndarray]]) -> list[tuple]:
+        resultados = self._em_paralelo(_tarefa_reproducao, [
+            (linhas, indice, self.aleatorio.bioma(indice, 'reproducao').bit_generator.state)
+            for indice, linhas in grupos
+        ])
+        for (indice, _), (estado, *_) in zip(grupos, resultados):
+            self.aleatorio.bioma(indice, 'reproducao').bit_generator.state = estado
+        return [resultado[1:] for resultado in resultados]
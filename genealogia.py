@@ -0,0 +1,170 @@
+import numpy as np
+from ambiente import SEM_BIOMA
+
+SEM_PAI = -1
+
+# tipo de cada coluna da tabela de nascimentos
+COLUNAS_GENEALOGIA = {
+    'id': np.int64,
+    'pai': np.int64,
+    'mae': np.int64,
+    'ano': np.int32,
+    'bioma': np.int8,
+}
+
+
+class Genealogia():
+    '''
+    tabela de nascimentos: id do filho -> ids do pai e da mae, ano e bioma em que nasceu
+
+    >>> só arrays numpy, nenhum objeto por individuo, entao um ancestral morto nao fica preso
+    na memoria (~29 bytes por nascimento). as linhas ficam em ordem crescente de id (os ids sao
+    sempre reservados em ordem), e achar a linha de um id é um searchsorted.
+
+    quem nao tem linha (a populacao inicial, ou quem nasceu antes da genealogia ser ligada) é
+    tratado como fundador. podar() descarta os ramos que nao levam a nenhum individuo vivo;
+    com `intervalo_poda` a Simulacao poda sozinha a cada tantos anos.
+    '''
+    def __init__(self, capacidade: int = 1024, intervalo_poda: int = None):
+        self.intervalo_poda = intervalo_poda
+        self.tamanho = 0
+        self._dados = {nome: np.zeros(max(1, capacidade), dtype=tipo) for nome, tipo in COLUNAS_GENEALOGIA.items()}
+        self._indice_filhos = None
+
+    def __len__(self) -> int:
+        return self.tamanho
+
+    def coluna(self, nome: str) -> np.ndarray:
+        return self._dados[nome][:self.tamanho]
+
+    @staticmethod
+    def bytes_por_nascimento() -> int:
+        return sum(np.dtype(tipo).itemsize for tipo in COLUNAS_GENEALOGIA.values())
+
+    def registrar(self, ids, pais, maes, ano: int, biomas=SEM_BIOMA):
+        '''acrescenta um lote de nascimentos, `ids` em ordem crescente e maiores que todos os ja registrados'''
+        ids = np.asarray(ids)
+        quantidade = len(ids)
+        if quantidade == 0:
+            return
+        if self.tamanho and ids[0] <= self._dados['id'][self.tamanho - 1]:
+            raise ValueError('os ids registrados na genealogia precisam ser crescentes')
+
+        fim = self.tamanho + quantidade
+        if fim > len(self._dados['id']):
+            nova_capacidade = max(fim, 2 * len(self._dados['id']))
+            for nome, coluna in self._dados.items():
+                nova = np.zeros(nova_capacidade, dtype=coluna.dtype)
+                nova[:self.tamanho] = coluna[:self.tamanho]
+                self._dados[nome] = nova
+
+        valores = {'id': ids, 'pai': pais, 'mae': maes, 'ano': ano, 'bioma': biomas}
+        for nome, valor in valores.items():
+            self._dados[nome][self.tamanho:fim] = valor
+        self.tamanho = fim
+        self._indice_filhos = None
+
+    def fim_do_ano(self, ano: int, ids_vivos: np.ndarray):
+        '''chamado pela Simulacao no fim de cada ano, poda quando for a hora'''
+        if self.intervalo_poda and ano % self.intervalo_poda == 0:
+            self.podar(ids_vivos)
+
+    # --- CONSULTAS ---
+
+    def _linhas(self, ids: np.ndarray) -> np.ndarray:
+        '''linhas dos `ids` que estao na tabela (os outros sao ignorados)'''
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        registrados = self.coluna('id')
+        linhas = np.searchsorted(registrados, ids)
+        dentro = linhas < self.tamanho
+        linhas = linhas[dentro]
+        return linhas[registrados[linhas] == ids[dentro]]
+
+    def pais(self, id: int) -> tuple[int, int]:
+        '''(pai, mae) de `id`, (SEM_PAI, SEM_PAI) para fundadores'''
+        linhas = self._linhas([id])
+        if len(linhas) == 0:
+            return SEM_PAI, SEM_PAI
+        return int(self._dados['pai'][linhas[0]]), int(self._dados['mae'][linhas[0]])
+
+    def _marcar_ancestrais(self, ids, geracoes: int = None) -> np.ndarray:
+        '''mascara das linhas dos `ids` e de todos os ancestrais deles (até `geracoes` acima)'''
+        marcadas = np.zeros(self.tamanho, dtype=bool)
+        fronteira = self._linhas(ids)
+        marcadas[fronteira] = True
+        geracao = 0
+        while len(fronteira) and (geracoes is None or geracao < geracoes):
+            pais = np.concatenate((self._dados['pai'][fronteira], self._dados['mae'][fronteira]))
+            fronteira = self._linhas(np.unique(pais[pais != SEM_PAI]))
+            fronteira = fronteira[~marcadas[fronteira]]
+            marcadas[fronteira] = True
+            geracao += 1
+        return marcadas
+
+    def ancestrais(self, id: int, geracoes: int = None) -> np.ndarray:
+        '''ids de todos os ancestrais de `id` (até `geracoes` acima), em ordem crescente, fundadores inclusive'''
+        if geracoes == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # as linhas de `id` e dos ancestrais com linha; os pais delas sao exatamente os ancestrais
+        marcadas = self._marcar_ancestrais([id], None if geracoes is None else geracoes - 1)
+        pais = np.concatenate((self.coluna('pai')[marcadas], self.coluna('mae')[marcadas]))
+        return np.unique(pais[pais != SEM_PAI])
+
+    def _filhos_de(self, ids: np.ndarray) -> np.ndarray:
+        '''linhas de todos os filhos dos `ids` (indice reverso pai/mae -> filho, refeito só quando a tabela muda)'''
+        if self._indice_filhos is None:
+            genitores = np.concatenate((self.coluna('pai'), self.coluna('mae')))
+            ordem = np.argsort(genitores, kind='stable')
+            self._indice_filhos = (genitores[ordem], ordem % max(1, self.tamanho))
+        genitores_ordenados, linhas_filhos = self._indice_filhos
+
+        inicio = np.searchsorted(genitores_ordenados, ids, side='left')
+        fim = np.searchsorted(genitores_ordenados, ids, side='right')
+        quantidades = fim - inicio
+        if quantidades.sum() == 0:
+            return np.empty(0, dtype=np.int64)
+        # junta os intervalos [inicio, fim) de todos os ids num só array de posicoes
+        posicoes = np.repeat(inicio - np.concatenate(([0], np.cumsum(quantidades)[:-1])), quantidades)
+        posicoes += np.arange(quantidades.sum())
+        return np.unique(linhas_filhos[posicoes])
+
+    def descendentes(self, id: int, geracoes: int = None) -> np.ndarray:
+        '''ids de todos os descendentes registrados de `id` (até `geracoes` abaixo), em ordem crescente'''
+        marcadas = np.zeros(self.tamanho, dtype=bool)
+        fronteira_ids = np.array([id], dtype=np.int64)
+        geracao = 0
+        while len(fronteira_ids) and (geracoes is None or geracao < geracoes):
+            filhos = self._filhos_de(fronteira_ids)
+            filhos = filhos[~marcadas[filhos]]
+            marcadas[filhos] = True
+            fronteira_ids = self.coluna('id')[filhos]
+            geracao += 1
+        return self.coluna('id')[marcadas]
+
+    # --- PODA ---
+
+    def podar(self, ids_vivos: np.ndarray) -> int:
+        '''mantem só as linhas dos vivos e dos ancestrais deles, retorna quantas linhas sairam'''
+        manter = self._marcar_ancestrais(ids_vivos)
+        removidas = self.tamanho - int(manter.sum())
+        if removidas:
+            linhas = np.flatnonzero(manter)
+            for coluna in self._dados.values():
+                coluna[:len(linhas)] = coluna[:self.tamanho][linhas]
+            self.tamanho = len(linhas)
+            self._indice_filhos = None
+        return removidas
+
+    # --- ARQUIVO ---
+
+    def salvar(self, caminho: str):
+        np.savez(caminho, **{nome: self.coluna(nome) for nome in COLUNAS_GENEALOGIA})
+
+    @classmethod
+    def carregar(cls, caminho: str, intervalo_poda: int = None) -> 'Genealogia':
+        with np.load(caminho) as dados:
+            genealogia = cls(capacidade=len(dados['id']), intervalo_poda=intervalo_poda)
+            if len(dados['id']):
+                genealogia.registrar(dados['id'], dados['pai'], dados['mae'], dados['ano'], dados['bioma'])
+        return genealogia
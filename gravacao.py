@@ -0,0 +1,160 @@
+import json
+import os
+import numpy as np
+from ambiente import Ambiente, Bioma, Cor, FonteDeRecurso
+from populacao import Populacao, COLUNAS
+
+VERSAO_GRAVACAO = 1
+ARQUIVO_META = 'meta.json'
+
+
+def _caminho_coluna(diretorio: str, nome: str) -> str:
+    return os.path.join(diretorio, f'{nome}.bin')
+
+
+class GravadorReplay():
+    '''
+    grava uma rodada para ser revista depois sem simular de novo (ver Gravacao e main.py --replay)
+
+    >>> um diretorio com um arquivo binario cru por coluna da Populacao, todos os anos em sequencia,
+    mais um indice por ano (ano e linha final de cada ano), a cor de cada bioma e a posicao de cada
+    fonte de recurso naquele ano. cada ano só acrescenta no fim dos arquivos; o indice é gravado
+    por ultimo, entao uma gravacao interrompida continua valida ate o ultimo ano completo.
+
+    a cada `intervalo` anos (1 = todos). pode ser usado direto como observador da Simulacao.
+    '''
+    def __init__(self, diretorio: str, ambiente: Ambiente, intervalo: int = 1):
+        self.diretorio = diretorio
+        self.intervalo = max(1, intervalo)
+        self.total_anos = 0
+        self.total_registros = 0
+        os.makedirs(diretorio, exist_ok=True)
+
+        meta = {
+            'versao': VERSAO_GRAVACAO,
+            'tamanho_x': ambiente.tamanho_x,
+            'tamanho_y': ambiente.tamanho_y,
+            'colunas': {nome: np.dtype(tipo).str for nome, tipo in COLUNAS.items()},
+            'biomas': [
+                {
+                    'nome': bioma.nome,
+                    'limites': bioma.limites,
+                    'fontes': [{'raio': fonte.raio, 'energia': fonte.energia_fornecida} for fonte in bioma.fontes_de_recurso],
+                }
+                for bioma in ambiente.biomas
+            ],
+        }
+        with open(os.path.join(diretorio, ARQUIVO_META), 'w', encoding='utf-8') as arquivo:
+            json.dump(meta, arquivo, ensure_ascii=False, indent=2)
+
+        nomes = [*COLUNAS, 'cores_biomas', 'fontes', 'anos', 'indice']
+        self._arquivos = {nome: open(_caminho_coluna(diretorio, nome), 'wb') for nome in nomes}
+
+    def __call__(self, simulacao):
+        if simulacao.ano % self.intervalo == 0:
+            self.registrar(simulacao.ano, simulacao.populacao, simulacao.ambiente)
+
+    def registrar(self, ano: int, populacao: Populacao, ambiente: Ambiente):
+        arquivos = self._arquivos
+        for nome in COLUNAS:
+            getattr(populacao, nome).tofile(arquivos[nome])
+        np.array([[bioma.cor.r, bioma.cor.g, bioma.cor.b] for bioma in ambiente.biomas], dtype=np.uint8).tofile(arquivos['cores_biomas'])
+        np.array([[fonte.x, fonte.y] for bioma in ambiente.biomas for fonte in bioma.fontes_de_recurso],
+                 dtype=np.int32).tofile(arquivos['fontes'])
+        np.array([ano], dtype=np.int32).tofile(arquivos['anos'])
+
+        self.total_registros += len(populacao)
+        self.total_anos += 1
+        # o indice por ultimo: um ano só "existe" para o leitor depois que todo o resto foi escrito
+        for nome, arquivo in arquivos.items():
+            if nome != 'indice':
+                arquivo.flush()
+        np.array([self.total_registros], dtype=np.int64).tofile(arquivos['indice'])
+        arquivos['indice'].flush()
+
+    def fechar(self):
+        for arquivo in self._arquivos.values():
+            arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+
+class Gravacao():
+    '''
+    leitura de uma gravacao do GravadorReplay
+
+    >>> todos os arquivos sao abertos com np.memmap, entao abrir custa o mesmo para 10 ou 10000 anos
+    e ir para qualquer ano é um searchsorted no indice: só as paginas daquele ano sao lidas do disco.
+
+    quadro(i) devolve o i-esimo ano gravado com o mesmo formato do Retrato da janela (ano, populacao,
+    ambiente), prontos para desenhar_ambiente / desenhar_fontes_recurso / desenhar_populacao.
+    a populacao é uma view das colunas gravadas (somente leitura) e o ambiente é um só,
+    atualizado a cada quadro.
+    '''
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        with open(os.path.join(diretorio, ARQUIVO_META), encoding='utf-8') as arquivo:
+            meta = json.load(arquivo)
+        if meta['versao'] != VERSAO_GRAVACAO:
+            raise ValueError(f"gravacao na versao {meta['versao']}, este leitor entende a {VERSAO_GRAVACAO}")
+
+        self.indice = self._mapear('indice', np.int64)
+        if len(self.indice) == 0:
+            raise ValueError(f"'{diretorio}' nao tem nenhum ano gravado")
+        quantidade = len(self.indice)
+        self.anos = self._mapear('anos', np.int32)[:quantidade]
+        self.colunas = {nome: self._mapear(nome, np.dtype(tipo)) for nome, tipo in meta['colunas'].items()}
+
+        self.ambiente = Ambiente(meta['tamanho_x'], meta['tamanho_y'], [])
+        for dados in meta['biomas']:
+            bioma = Bioma(dados['nome'], 0.0, Cor(0, 0, 0), energia_fornecida=0)
+            bioma.limites = dados['limites']
+            bioma.fontes_de_recurso = [FonteDeRecurso(0, 0, fonte['raio'], fonte['energia']) for fonte in dados['fontes']]
+            self.ambiente.biomas.append(bioma)
+        self._fontes = [fonte for bioma in self.ambiente.biomas for fonte in bioma.fontes_de_recurso]
+        # só os anos completos: numa gravacao interrompida a ultima linha destes arquivos pode estar pela metade
+        qtd_biomas, qtd_fontes = len(self.ambiente.biomas), len(self._fontes)
+        self.cores_biomas = self._mapear('cores_biomas', np.uint8)[:quantidade * qtd_biomas * 3] \
+            .reshape(quantidade, qtd_biomas, 3)
+        self.posicoes_fontes = self._mapear('fontes', np.int32)[:quantidade * qtd_fontes * 2] \
+            .reshape(quantidade, qtd_fontes, 2)
+
+    def _mapear(self, nome: str, tipo) -> np.ndarray:
+        '''o arquivo inteiro como array, ignorando um pedaco de elemento no fim (escrita interrompida)'''
+        caminho = _caminho_coluna(self.diretorio, nome)
+        quantidade = os.path.getsize(caminho) // np.dtype(tipo).itemsize
+        if quantidade == 0:
+            return np.zeros(0, dtype=tipo)
+        return np.memmap(caminho, dtype=tipo, mode='r', shape=(quantidade,))
+
+    def __len__(self) -> int:
+        return len(self.anos)
+
+    def posicao_do_ano(self, ano: int) -> int:
+        '''posicao do ultimo quadro gravado no `ano` ou antes dele (o primeiro, se for antes de todos)'''
+        return max(0, int(np.searchsorted(self.anos, ano, side='right')) - 1)
+
+    def quadro(self, posicao: int) -> 'Quadro':
+        posicao = min(max(0, posicao), len(self) - 1)
+        inicio = int(self.indice[posicao - 1]) if posicao > 0 else 0
+        fim = int(self.indice[posicao])
+
+        for bioma, cor in zip(self.ambiente.biomas, self.cores_biomas[posicao].tolist()):
+            bioma.cor.r, bioma.cor.g, bioma.cor.b = cor
+        for fonte, (x, y) in zip(self._fontes, self.posicoes_fontes[posicao].tolist()):
+            fonte.x, fonte.y = x, y
+
+        populacao = Populacao.sobre_colunas({nome: coluna[inicio:fim] for nome, coluna in self.colunas.items()})
+        return Quadro(int(self.anos[posicao]), populacao, self.ambiente)
+
+
+class Quadro:
+    '''um ano da gravacao, com os mesmos campos do Retrato da janela'''
+    def __init__(self, ano: int, populacao: Populacao, ambiente: Ambiente):
+        self.ano = ano
+        self.populacao = populacao
+        self.ambiente = ambiente
@@ -0,0 +1,225 @@
+import argparse
+import os
+import time
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Client, Connection, Listener
+import numpy as np
+from simulacao import Simulacao, Configuracao, NUMERO_DE_ANOS
+
+PORTA_PADRAO = 6000
+VARIAVEL_CHAVE = 'ILHAS_CHAVE'     # variavel de ambiente com a chave das conexoes por socket, se nao vier --chave
+
+
+# --- LADO DE CADA ILHA ---
+
+def _servir(conexao: Connection):
+    '''
+    laco de uma ilha: recebe comandos (nome, *argumentos) pela conexao e responde cada um.
+    um erro volta como a propria excecao, para o arquipelago levantar do lado dele
+    '''
+    simulacao = None
+    rng_migracao = None
+    while True:
+        comando, *argumentos = conexao.recv()
+        try:
+            if comando == 'iniciar':
+                semente, semente_migracao, parametros = argumentos
+                simulacao = Simulacao(semente=semente, config=Configuracao(**parametros))
+                rng_migracao = np.random.default_rng(semente_migracao)
+                resposta = len(simulacao.populacao)
+            elif comando == 'rodar':
+                simulacao.run(argumentos[0])
+                resposta = (simulacao.ano, len(simulacao.populacao))
+            elif comando == 'emigrar':
+                resposta = simulacao.emigrar(argumentos[0], rng_migracao)
+            elif comando == 'imigrar':
+                simulacao.imigrar(argumentos[0])
+                resposta = len(simulacao.populacao)
+            elif comando == 'fechar':
+                conexao.send(None)
+                conexao.close()
+                return
+            else:
+                raise ValueError(f"comando desconhecido: '{comando}'")
+        except Exception as erro:
+            resposta = erro
+        conexao.send(resposta)
+
+
+def servir_ilha(chave: bytes, endereco: tuple[str, int] = ('localhost', PORTA_PADRAO)):
+    '''
+    espera um arquipelago se conectar por socket e roda uma ilha para ele ate ele fechar.
+    as mensagens sao pickle: quem tiver a `chave` (authkey) e alcancar a porta roda codigo aqui,
+    entao a chave é obrigatoria e deve ser secreta, e o endereco padrao só aceita conexoes locais
+    '''
+    if not chave:
+        raise ValueError('servir_ilha precisa de uma chave')
+    with Listener(endereco, authkey=chave) as ouvinte:
+        with ouvinte.accept() as conexao:
+            _servir(conexao)
+
+
+# --- COORDENADOR ---
+
+class Arquipelago():
+    '''
+    modelo de ilhas: varias Simulacao independentes (cada uma com seu Ambiente e sua populacao),
+    cada uma no seu processo, trocando migrantes de tempos em tempos
+
+    >>> as ilhas rodam `intervalo_migracao` anos em paralelo, sem falar umas com as outras, e entao
+    cada uma manda uma `fracao_migrantes` sorteada da sua populacao para a proxima (em anel).
+    o passo de cada ilha é o mesmo da Simulacao sozinha, entao a populacao total cresce com a
+    quantidade de nucleos (ou maquinas) sem deixar nenhum ano mais lento.
+
+    as ilhas locais sao processos ligados por Pipe; `enderecos` acrescenta ilhas remotas, cada uma
+    um `python ilhas.py --servir PORTA` esperando em outra maquina (mesmo protocolo, por socket).
+    a semente de cada ilha sai da `semente` do arquipelago pela posicao dela, entao a rodada é a
+    mesma com ilhas locais ou remotas (que exigem a mesma `chave` do servir_ilha delas).
+    use como context manager (ou chame fechar()).
+    '''
+    def __init__(self,
+                 qtd_ilhas: int = None,
+                 semente: int = None,
+                 config: Configuracao = None,
+                 fracao_migrantes: float = 0.05,
+                 intervalo_migracao: int = 10,
+                 enderecos: list[tuple[str, int]] = None,
+                 chave: bytes = None,
+                 ):
+        enderecos = list(enderecos or [])
+        if enderecos and not chave:
+            raise ValueError('ilhas remotas precisam de uma chave')
+        if qtd_ilhas is None:
+            qtd_ilhas = len(enderecos) or os.cpu_count()
+        if qtd_ilhas < len(enderecos):
+            raise ValueError('qtd_ilhas menor que a quantidade de enderecos remotos')
+
+        self.config = config if config is not None else Configuracao()
+        self.fracao_migrantes = fracao_migrantes
+        self.intervalo_migracao = intervalo_migracao
+        self.ano = 0
+        self.populacoes = []
+
+        self.conexoes = []
+        self._processos = []
+        for _ in range(qtd_ilhas - len(enderecos)):
+            conexao, conexao_ilha = Pipe()
+            processo = Process(target=_servir, args=(conexao_ilha,), daemon=True)
+            processo.start()
+            conexao_ilha.close()
+            self.conexoes.append(conexao)
+            self._processos.append(processo)
+        for endereco in enderecos:
+            self.conexoes.append(Client(endereco, authkey=chave))
+
+        sequencia = np.random.SeedSequence(semente)
+        self.semente = sequencia.entropy
+        self.populacoes = self._em_todas([
+            ('iniciar', *(int(valor) for valor in filha.generate_state(2, np.uint64)), self.config.como_dict())
+            for filha in sequencia.spawn(qtd_ilhas)
+        ])
+
+    @property
+    def qtd_ilhas(self) -> int:
+        return len(self.conexoes)
+
+    @property
+    def populacao_total(self) -> int:
+        return sum(self.populacoes)
+
+    def _em_todas(self, comandos: list[tuple]) -> list:
+        '''manda um comando para cada ilha e só depois espera as respostas, para elas trabalharem em paralelo'''
+        for conexao, comando in zip(self.conexoes, comandos):
+            conexao.send(comando)
+        respostas = [conexao.recv() for conexao in self.conexoes]
+        for resposta in respostas:
+            if isinstance(resposta, Exception):
+                raise resposta
+        return respostas
+
+    def migrar(self):
+        '''cada ilha manda uma fracao sorteada da sua populacao para a proxima ilha do anel'''
+        if self.qtd_ilhas < 2 or self.fracao_migrantes <= 0:
+            return
+        emigrantes = self._em_todas([('emigrar', self.fracao_migrantes)] * self.qtd_ilhas)
+        # a ilha i recebe da ilha i - 1 (a 0 recebe da ultima)
+        self.populacoes = self._em_todas([('imigrar', emigrantes[i - 1]) for i in range(self.qtd_ilhas)])
+
+    def run(self, n_anos: int, observador=None) -> int:
+        '''roda n_anos em blocos de intervalo_migracao, migrando entre os blocos; retorna o ano em que parou'''
+        restantes = n_anos
+        while restantes > 0:
+            anos = min(self.intervalo_migracao, restantes)
+            resultados = self._em_todas([('rodar', anos)] * self.qtd_ilhas)
+            self.populacoes = [tamanho for _, tamanho in resultados]
+            self.ano += anos
+            restantes -= anos
+            if self.ano % self.intervalo_migracao == 0:
+                self.migrar()
+            if observador is not None:
+                observador(self)
+        return self.ano
+
+    def fechar(self):
+        for conexao in self.conexoes:
+            try:
+                conexao.send(('fechar',))
+                conexao.recv()
+            except (EOFError, OSError):
+                pass
+            conexao.close()
+        for processo in self._processos:
+            processo.join()
+        self.conexoes = []
+        self._processos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+
+def _ler_endereco(texto: str) -> tuple[str, int]:
+    '''"host:porta" -> ('host', porta)'''
+    host, _, porta = texto.rpartition(':')
+    return host or 'localhost', int(porta)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Modelo de ilhas: varias simulacoes em paralelo trocando migrantes.')
+    parser.add_argument('--ilhas', type=int, default=None, help='quantidade de ilhas (padrao: uma por nucleo)')
+    parser.add_argument('--anos', type=int, default=NUMERO_DE_ANOS)
+    parser.add_argument('--semente', type=int, default=None)
+    parser.add_argument('--fracao-migrantes', type=float, default=0.05)
+    parser.add_argument('--intervalo-migracao', type=int, default=10)
+    parser.add_argument('--remotas', nargs='*', default=[], metavar='HOST:PORTA',
+                        help='ilhas em outras maquinas (cada uma rodando ilhas.py --servir)')
+    parser.add_argument('--servir', type=int, default=None, metavar='PORTA',
+                        help='em vez de coordenar, espera um arquipelago nessa porta e roda uma ilha para ele')
+    parser.add_argument('--host', default='localhost',
+                        help='interface em que --servir escuta (padrao: só conexoes locais; 0.0.0.0 para todas)')
+    parser.add_argument('--chave', default=os.environ.get(VARIAVEL_CHAVE),
+                        help=f'chave das conexoes por socket, a mesma na ilha e no coordenador (padrao: ${VARIAVEL_CHAVE})')
+    args = parser.parse_args()
+    chave = args.chave.encode() if args.chave else None
+    if chave is None and (args.servir is not None or args.remotas):
+        parser.error(f'--servir e --remotas precisam de --chave (ou da variavel {VARIAVEL_CHAVE})')
+
+    if args.servir is not None:
+        print(f'Ilha esperando conexao em {args.host}:{args.servir}')
+        servir_ilha(chave, (args.host, args.servir))
+    else:
+        def imprimir_progresso(arquipelago):
+            print(f'Ano {arquipelago.ano}: População = {arquipelago.populacao_total} {arquipelago.populacoes}')
+
+        inicio = time.perf_counter()
+        with Arquipelago(args.ilhas, args.semente, fracao_migrantes=args.fracao_migrantes,
+                         intervalo_migracao=args.intervalo_migracao,
+                         enderecos=[_ler_endereco(texto) for texto in args.remotas], chave=chave) as arquipelago:
+            if args.semente is None:
+                print(f'Semente: {arquipelago.semente} (use --semente para repetir esta rodada)')
+            arquipelago.run(args.anos, imprimir_progresso)
+            qtd_ilhas = arquipelago.qtd_ilhas
+        duracao = time.perf_counter() - inicio
+        print(f'{qtd_ilhas} ilhas, {args.anos} anos em {duracao:.2f}s')
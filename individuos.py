@@ -2,6 +2,7 @@
 
 import random
 import math
+import numpy as np
 
 QTD_MAX_INDIVIDUOS = 5000
 QTD_INICIAL_INDIVIDUOS = 2000
@@ -15,6 +16,7 @@ FATOR_SOBREVIVENCIA = 0.5
 AMBIENTE_X_MAX = 1000
 AMBIENTE_Y_MAX = 600
 MAX_DISTANCIA_COR = 441.67
+MAX_DISTANCIA_COR_QUADRADO = 3 * 255**2     # maior distancia ao quadrado entre duas cores rgb inteiras
 
 ENERGIA_MAXIMA = 500           
 ENERGIA_INICIAL = 200
@@ -80,25 +82,31 @@ class Mutacao():
     >>> modifica os genens e cria variações
     '''
     
-    def __init__(self, intensidade:int=INTENSIDADE_MUTACAO, taxa:float=TAXA_MUTACAO):
+    def __init__(self, intensidade:int=INTENSIDADE_MUTACAO, taxa:float=TAXA_MUTACAO, rng=random,
+                 x_max:int=AMBIENTE_X_MAX, y_max:int=AMBIENTE_Y_MAX, x_min:int=0, y_min:int=0):
         self.taxa = taxa
         self.intensidade = intensidade
+        self.rng = rng
+        self.x_min = x_min
+        self.y_min = y_min
+        self.x_max = x_max
+        self.y_max = y_max
         
     def verificar_chance(self) -> bool:
-        return random.random() < self.taxa
+        return self.rng.random() < self.taxa
             
     def _aplicar_mutacao(self, gene_descendente: Genes) -> Genes:
         
         # posicao
-        mudanca_x = random.randint(-self.intensidade, self.intensidade)
-        mudanca_y = random.randint(-self.intensidade, self.intensidade)
+        mudanca_x = self.rng.randint(-self.intensidade, self.intensidade)
+        mudanca_y = self.rng.randint(-self.intensidade, self.intensidade)
         
         # cor
         
         intensidade_cor = self.intensidade * 2
-        mudanca_r = random.randint(-intensidade_cor, intensidade_cor)
-        mudanca_g = random.randint(-intensidade_cor, intensidade_cor)
-        mudanca_b = random.randint(-intensidade_cor, intensidade_cor)
+        mudanca_r = self.rng.randint(-intensidade_cor, intensidade_cor)
+        mudanca_g = self.rng.randint(-intensidade_cor, intensidade_cor)
+        mudanca_b = self.rng.randint(-intensidade_cor, intensidade_cor)
                                                 
         gene_descendente.x += mudanca_x
         gene_descendente.y += mudanca_y
@@ -106,8 +114,8 @@ class Mutacao():
         gene_descendente.cor.g += mudanca_g
         gene_descendente.cor.b += mudanca_b
                                                       
-        gene_descendente.x = max(0, min(gene_descendente.x, AMBIENTE_X_MAX))
-        gene_descendente.y = max(0, min(gene_descendente.y, AMBIENTE_Y_MAX))
+        gene_descendente.x = max(self.x_min, min(gene_descendente.x, self.x_max))
+        gene_descendente.y = max(self.y_min, min(gene_descendente.y, self.y_max))
         
         gene_descendente.cor.r = max(0, min(gene_descendente.cor.r, 255))
         gene_descendente.cor.g = max(0, min(gene_descendente.cor.g, 255))
@@ -127,28 +135,53 @@ class Mutacao():
             return gene_descendente    
 
 
+    # --- MODO EM LOTE ---
+    # mesmo sorteio de verificar_chance e mesmas somas/limites de _aplicar_mutacao,
+    # para todos os descendentes do ano de uma vez
+
+    def mutar_lote(self, genes: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        '''
+        genes: array (n, 5) de inteiros com x, y, r, g, b de cada descendente
+        retorna um novo array (n, 5), só as linhas sorteadas (chance `taxa`) sofrem mutacao
+        '''
+        genes = np.array(genes, dtype=np.int64)
+        mutados = np.flatnonzero(rng.random(len(genes)) < self.taxa)
+        if len(mutados) == 0:
+            return genes
+
+        intensidade_cor = self.intensidade * 2
+        limites = np.array([self.intensidade] * 2 + [intensidade_cor] * 3)
+        mudancas = rng.integers(-limites, limites, size=(len(mutados), 5), endpoint=True)
+
+        minimos = np.array([self.x_min, self.y_min, 0, 0, 0])
+        maximos = np.array([self.x_max, self.y_max, 255, 255, 255])
+        genes[mutados] = np.clip(genes[mutados] + mudancas, minimos, maximos)
+        return genes
+
+
 class ReproducaoSexuada():
     '''
     >>> perpetua as informações contidas nos genes
     '''
-    def __init__(self, pai:Individuo, mae:Individuo):
+    def __init__(self, pai:Individuo, mae:Individuo, rng=random, mutacao:Mutacao=None):
         self.pai_gene = pai
         self.mae_gene = mae
+        self.rng = rng
+        self.mutacao = mutacao if mutacao is not None else Mutacao(rng=rng)
     
     def reproduzir(self) -> Genes:
         pai_gene = self.pai_gene.gene
         mae_gene = self.mae_gene.gene
         filho_gene = None
 
-        filho_x = random.choice([pai_gene.x, mae_gene.x])
-        filho_y = random.choice([pai_gene.y, mae_gene.y])
-        filho_r = random.choice([pai_gene.cor.r, mae_gene.cor.r])
-        filho_g = random.choice([pai_gene.cor.g, mae_gene.cor.g])
-        filho_b = random.choice([pai_gene.cor.b, mae_gene.cor.b])
+        filho_x = self.rng.choice([pai_gene.x, mae_gene.x])
+        filho_y = self.rng.choice([pai_gene.y, mae_gene.y])
+        filho_r = self.rng.choice([pai_gene.cor.r, mae_gene.cor.r])
+        filho_g = self.rng.choice([pai_gene.cor.g, mae_gene.cor.g])
+        filho_b = self.rng.choice([pai_gene.cor.b, mae_gene.cor.b])
     
         filho_gene_base = Genes(x_pos=filho_x, y_pos=filho_y, cor=Cor(filho_r, filho_g, filho_b))
-        processo_mutacao = Mutacao()
-        filho = processo_mutacao.mutar(filho_gene_base)
+        filho = self.mutacao.mutar(filho_gene_base)
         
         return filho
   
@@ -157,7 +190,26 @@ class ReproducaoSexuada():
         return (f"PAI:({self.pai_gene}) "
                 f"MAE:({self.mae_gene})")
 
+
+    # --- MODO EM LOTE ---
+
+    @staticmethod
+    def reproduzir_lote(genes_pais: np.ndarray, genes_maes: np.ndarray, rng: np.random.Generator,
+                        mutacao: Mutacao) -> np.ndarray:
+        '''
+        genes_pais, genes_maes: arrays (n, 5) com x, y, r, g, b de cada casal (linha i do pai com linha i da mae)
+        cada gene do filho vem do pai ou da mae com 50% de chance (como os rng.choice de reproduzir),
+        depois o lote inteiro passa pela mutacao. retorna (n, 5).
+        '''
+        genes_pais = np.asarray(genes_pais)
+        do_pai = rng.random(genes_pais.shape) < 0.5
+        genes_filhos = np.where(do_pai, genes_pais, genes_maes)
+        return mutacao.mutar_lote(genes_filhos, rng)
+
    
+_tabelas_probabilidade_morte = {}
+
+
 class SelecaoNatural():
     '''
     >>> Filtra as melhores variações
@@ -170,9 +222,10 @@ class SelecaoNatural():
     
     distancia euclidiana
     '''    
-    def __init__(self, cor_alvo: Cor, fator_de_pressao: float = FATOR_SOBREVIVENCIA):
+    def __init__(self, cor_alvo: Cor, fator_de_pressao: float = FATOR_SOBREVIVENCIA, rng=random):
         self.cor_alvo = cor_alvo
         self.fator_de_pressao = fator_de_pressao
+        self.rng = rng
     
     
     def _calcular_distancia_das_cores(self, cor1: Cor, cor2: Cor) -> float:
@@ -195,19 +248,67 @@ class SelecaoNatural():
         return max(0.0, min(1.0, probabilidade_ajustada))
 
 
+    def sobrevive(self, cor: Cor) -> bool:
+        '''sorteia se um individuo com essa cor sobrevive a este ano'''
+        distancia = self._calcular_distancia_das_cores(cor, self.cor_alvo)
+        probabilidade_morte = self._calcular_probabilidade_morte(distancia)
+        
+        return self.rng.random() > probabilidade_morte
+
+
     def aplicar_selecao(self, populacao: list[Individuo]) -> list[Individuo]:
         '''Filtra populacao, retornando uma nova lista apenas com os sobreviventes.'''
         
         sobreviventes = []
         
         for individuo in populacao:
-            distancia = self._calcular_distancia_das_cores(individuo.gene.cor, self.cor_alvo)
-            probabilidade_morte = self._calcular_probabilidade_morte(distancia)
-            
-            if random.random() > probabilidade_morte:
+            if self.sobrevive(individuo.gene.cor):
                 sobreviventes.append(individuo)
                 
         return sobreviventes
+
+
+    # --- MODO EM LOTE ---
+    # mesmas contas de _calcular_distancia_das_cores e _calcular_probabilidade_morte,
+    # mas para um array de cores de uma vez só
+
+    @staticmethod
+    def calcular_probabilidade_morte_lote(cores: np.ndarray, cores_alvo: np.ndarray,
+                                          fator_de_pressao: float = FATOR_SOBREVIVENCIA) -> np.ndarray:
+        '''
+        cores: array (n, 3) de rgb
+        cores_alvo: array (n, 3) com a cor do bioma de cada individuo, ou (3,) se for a mesma para todos
+        '''
+        delta = np.asarray(cores, dtype=np.float64) - np.asarray(cores_alvo, dtype=np.float64)
+        distancia = np.sqrt(np.sum(delta * delta, axis=-1))
+        
+        probabilidade_ajustada = distancia / MAX_DISTANCIA_COR * fator_de_pressao
+        
+        return np.clip(probabilidade_ajustada, 0.0, 1.0)
+
+
+    @staticmethod
+    def tabela_probabilidade_morte(fator_de_pressao: float = FATOR_SOBREVIVENCIA) -> np.ndarray:
+        '''
+        probabilidade de morte para cada distancia ao quadrado possivel entre duas cores (0 a 3 * 255²),
+        as mesmas contas de calcular_probabilidade_morte_lote. calculada uma vez por fator de pressao
+        '''
+        tabela = _tabelas_probabilidade_morte.get(fator_de_pressao)
+        if tabela is None:
+            distancia = np.sqrt(np.arange(MAX_DISTANCIA_COR_QUADRADO + 1, dtype=np.float64))
+            tabela = np.clip(distancia / MAX_DISTANCIA_COR * fator_de_pressao, 0.0, 1.0)
+            _tabelas_probabilidade_morte[fator_de_pressao] = tabela
+        return tabela
+
+
+    @staticmethod
+    def aplicar_selecao_lote(cores: np.ndarray, cores_alvo: np.ndarray, rng: np.random.Generator,
+                             fator_de_pressao: float = FATOR_SOBREVIVENCIA) -> np.ndarray:
+        '''retorna a mascara booleana dos sobreviventes, um sorteio por individuo'''
+        
+        probabilidade_morte = SelecaoNatural.calcular_probabilidade_morte_lote(cores, cores_alvo, fator_de_pressao)
+        
+        return rng.random(len(probabilidade_morte)) > probabilidade_morte
     
         
 
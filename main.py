@@ -1,14 +1,15 @@
+import argparse
+import copy
+import threading
+import numpy as np
 import pygame
-import pandas as pd
-import random
-from ambiente import Ambiente, Bioma, Cor, BRANCO, PRETO,  FonteDeRecurso
-from individuos import (
-    Genes, Individuo, ReproducaoSexuada, SelecaoNatural, 
-    IDADE_MAX, QTD_INICIAL_INDIVIDUOS, AMBIENTE_X_MAX, AMBIENTE_Y_MAX,
-    QTD_MAX_INDIVIDUOS, DISTANCIA_REPRODUCAO,
-    
-    ENERGIA_INICIAL, ENERGIA_MAXIMA, CUSTO_MOVIMENTO, CUSTO_REPRODUCAO
-)
+from ambiente import Ambiente, BRANCO, PRETO
+from individuos import AMBIENTE_X_MAX, AMBIENTE_Y_MAX
+from populacao import Populacao
+from estatisticas import EstatisticasPorBioma
+from gravacao import Gravacao
+from registro import RegistradorColunar
+from simulacao import Simulacao, NUMERO_DE_ANOS
 
 # --- PARAMETROS VISUALIZAÇÃO ---
 
@@ -16,17 +17,21 @@ LARGURA_TELA = 1000
 ALTURA_TELA = 600
 FPS = 60
 RAIO_INDIVIDUO = 4
+ANOS_POR_QUADRO_ACELERADO = 10   # no modo acelerado, desenha só 1 a cada N anos
+MAX_SPRITES_EM_CACHE = 65_536   # cores distintas guardadas antes de limpar o cache
+COR_CHAVE_SPRITE = (255, 0, 255)
+COR_CHAVE_SPRITE_INT = 0xFF00FF
+COR_CHAVE_SPRITE_ALTERNATIVA = (0, 255, 255)
+MAX_SUPERFICIES_FONTES = 64     # raios de fonte guardados (um por nivel de zoom visto)
+QUADROS_POR_SEGUNDO_REPLAY = 30  # velocidade inicial do replay (anos gravados por segundo)
+ALTURA_BARRA_TEMPO = 12
 
+# --- PARAMETROS LOG ---
+SALVAR_DADOS_INDIVIDUAIS = True
+ARQUIVO_DADOS_INDIVIDUAIS = 'dados_individuais_simulacao'   # a extensao vem do formato (parquet, ou binario sem pyarrow)
+SALVAR_ESTATISTICAS = True              # serie agregada por ano e bioma, bem menor que o log por individuo
+ARQUIVO_ESTATISTICAS = 'estatisticas_simulacao.csv'
 
-# --- PARAMETROS SIMULACAO ---
-INTENSIDADE_MIGRACAO = 0     
-NUMERO_DE_ANOS = 4000
-IDADE_REPRODUTIVA = 10
-
-QTD_FONTES_POR_BIOMA = 1
-RAIO_FONTE_RECURSO = 45
-INTENSIDADE_MOV_RECURSO = 10
-INTENSIDADE_VARIACAO_COR = 0
 
 class Camera:
     def __init__(self):
@@ -47,6 +52,15 @@ class Camera:
     def raio_para_tela(self, raio_mundo):
         '''converte o raio de um objeto para o tamanho na tela -> considera o zoom '''
         return max(1, int(raio_mundo * self.zoom))
+
+    def retangulo_visivel(self, largura=LARGURA_TELA, altura=ALTURA_TELA, margem=0):
+        '''retangulo do mundo que aparece na tela: (x_inicio, y_inicio, x_fim, y_fim), com `margem` (em pixels) para cada lado'''
+        return (
+            self.offset_x - margem / self.zoom,
+            self.offset_y - margem / self.zoom,
+            self.offset_x + (largura + margem) / self.zoom,
+            self.offset_y + (altura + margem) / self.zoom,
+        )
     
     def lidar_eventos(self, evento):
         '''processa os eventos do mouse para zoom e pan'''
@@ -75,68 +89,88 @@ class Camera:
             self.mouse_pos_inicial = evento.pos
             
                 
-def cria_populacao_inicial(quantidade: int, ambiente: Ambiente) -> list[Individuo]:
-    ''' Cria uma populacao inicial, diversificada e distribuída dentro de cada bioma.'''
-    
-    populacao = []
-    qtd_por_bioma = quantidade // len(ambiente.biomas)
+class CacheSprites:
+    '''
+    guarda o circulo de cada individuo (borda preta + cor) ja desenhado numa Surface pequena,
+    uma por cor, para a populacao ser desenhada com um unico tela.blits(...) por frame.
+    o raio na tela faz parte da chave: quando o zoom muda o raio, o cache inteiro é descartado.
+    '''
+    def __init__(self, max_sprites: int = MAX_SPRITES_EM_CACHE):
+        self.max_sprites = max_sprites
+        self.raio = None
+        self.sprites = {}
 
-    for bioma in ambiente.biomas:
-        limites = bioma.limites
-        for _ in range(qtd_por_bioma):
-            gene = Genes(
-                x_pos= random.randint(limites['x_inicio'], limites['x_fim']),
-                y_pos= random.randint(limites['y_inicio'], limites['y_fim']),
-                cor=Cor(r=random.randint(0, 255), g=random.randint(0, 255), b=random.randint(0, 255))
-            )
-            
-            individuo = Individuo(gene=gene, idade=random.randint(0, IDADE_MAX), qtdfilhos=0, energia=ENERGIA_INICIAL)
-            populacao.append(individuo)
-            
-    return populacao
-    
+    def preparar(self, raio_tela: int):
+        if raio_tela != self.raio or len(self.sprites) > self.max_sprites:
+            self.limpar()
+            self.raio = raio_tela
 
-def pega_bioma_do_individuo(individuo: Individuo, ambiente: Ambiente) -> Bioma:
-    x, y = individuo.gene.x, individuo.gene.y
-    for bioma in ambiente.biomas:
-        limites = bioma.limites
-        if limites['x_inicio'] <= x <= limites['x_fim'] and limites['y_inicio'] <= y <= limites['y_fim']:
-            return bioma
-    return None
+    def limpar(self):
+        # libera do mais novo para o mais velho: o SDL procura cada Surface liberada numa lista
+        # encadeada da tela (mais novas na frente), na ordem de insercao isso vira O(n²)
+        while self.sprites:
+            self.sprites.popitem()
 
+    def sprite(self, cor: int) -> pygame.Surface:
+        '''`cor` empacotada em um int (r << 16 | g << 8 | b)'''
+        sprite = self.sprites.get(cor)
+        if sprite is None:
+            raio = self.raio
+            centro = (raio + 1, raio + 1)
+            # fundo transparente por colorkey (blit bem mais rapido que alpha por pixel),
+            # com uma cor chave que nao seja nem a do individuo nem a borda preta
+            chave = COR_CHAVE_SPRITE if cor != COR_CHAVE_SPRITE_INT else COR_CHAVE_SPRITE_ALTERNATIVA
+            sprite = pygame.Surface((2 * raio + 3, 2 * raio + 3))
+            sprite.fill(chave)
+            pygame.draw.circle(sprite, PRETO, centro, raio + 1, 1)
+            pygame.draw.circle(sprite, (cor >> 16, (cor >> 8) & 0xFF, cor & 0xFF), centro, raio)
+            sprite.set_colorkey(chave)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert()
+            self.sprites[cor] = sprite
+        return sprite
 
-def mover_populacao(populacao: list[Individuo]):
-    for individuo in populacao:
-        mov_x = random.randint(-INTENSIDADE_MIGRACAO, INTENSIDADE_MIGRACAO)
-        mov_y = random.randint(-INTENSIDADE_MIGRACAO, INTENSIDADE_MIGRACAO)
-        
-        individuo.gene.x += mov_x
-        individuo.gene.y += mov_y
-    
-        individuo.gene.x = max(0, min(individuo.gene.x, AMBIENTE_X_MAX))
-        individuo.gene.y = max(0, min(individuo.gene.y, AMBIENTE_Y_MAX))
-        
-        individuo.energia -= CUSTO_MOVIMENTO
 
+_cache_sprites = CacheSprites()
+_superficies_fontes = {}
 
-def variar_cores_biomas(ambiente: Ambiente, intensidade: int, ano:int):
-    """Altera sutilmente a cor de cada bioma a cada ano."""
-    
-    if (ano // 16 == 0):
-        for bioma in ambiente.biomas:
-            dr = random.randint(-intensidade, intensidade)
-            dg = random.randint(-intensidade, intensidade)
-            db = random.randint(-intensidade, intensidade)
+# --- FUNÇÕES DE DENSENHO ---
 
-            bioma.cor.r = max(0, min(255, bioma.cor.r + dr))
-            bioma.cor.g = max(0, min(255, bioma.cor.g + dg))
-            bioma.cor.b = max(0, min(255, bioma.cor.b + db))
+def _superficie_fonte(raio_tela: int) -> pygame.Surface:
+    '''circulo da fonte (borda preta + verde transparente) para um raio na tela, criado uma vez por raio'''
+    surface = _superficies_fontes.get(raio_tela)
+    if surface is None:
+        if len(_superficies_fontes) > MAX_SUPERFICIES_FONTES:   # zoom mudou muitas vezes
+            _superficies_fontes.clear()
+
+        # 1. Define o raio da borda e o tamanho da superfície com base nela
+        raio_borda = raio_tela + 1
+        tamanho_surface = raio_borda * 2
+
+        # 2. Cria a superfície com o tamanho correto
+        surface = pygame.Surface((tamanho_surface, tamanho_surface), pygame.SRCALPHA)
+
+        # O centro da superfície agora é (raio_borda, raio_borda)
+        centro_surface = (raio_borda, raio_borda)
+
+        # 3. Desenha a borda PRETA e PREENCHIDA no centro da superfície
+        pygame.draw.circle(surface, PRETO, centro_surface, raio_borda)
+
+        # 4. Desenha o círculo verde transparente por cima, também no centro
+        pygame.draw.circle(surface, (200, 255, 200, 60), centro_surface, raio_tela)
+
+        _superficies_fontes[raio_tela] = surface
+    return surface
 
-# --- FUNÇÕES DE DENSENHO ---
 
 def desenhar_fontes_recurso(tela, ambiente: Ambiente, camera: Camera):
+    x_inicio, y_inicio, x_fim, y_fim = camera.retangulo_visivel(*tela.get_size(), margem=2)
     for bioma in ambiente.biomas:
         for f in bioma.fontes_de_recurso:
+            # fora da tela
+            if f.x + f.raio < x_inicio or f.x - f.raio > x_fim or f.y + f.raio < y_inicio or f.y - f.raio > y_fim:
+                continue
+
             pos_tela = camera.mundo_para_tela(f.x, f.y)
             raio_tela = camera.raio_para_tela(f.raio)
             
@@ -144,27 +178,46 @@ def desenhar_fontes_recurso(tela, ambiente: Ambiente, camera: Camera):
             if raio_tela < 2:
                 continue
 
-            # 1. Define o raio da borda e o tamanho da superfície com base nela
+            # Posiciona a superfície (reaproveitada entre frames) na tela, ajustando pelo raio da borda
             raio_borda = raio_tela + 1
-            tamanho_surface = raio_borda * 2
-            
-            # 2. Cria a superfície com o tamanho correto
-            surface = pygame.Surface((tamanho_surface, tamanho_surface), pygame.SRCALPHA)
-            
-            # O centro da superfície agora é (raio_borda, raio_borda)
-            centro_surface = (raio_borda, raio_borda)
+            pos_blit = (pos_tela[0] - raio_borda, pos_tela[1] - raio_borda)
+            tela.blit(_superficie_fonte(raio_tela), pos_blit)
 
-            # 3. Desenha a borda PRETA e PREENCHIDA no centro da superfície
-            pygame.draw.circle(surface, PRETO, centro_surface, raio_borda)
 
-            # 4. Desenha o círculo verde transparente por cima, também no centro
-            pygame.draw.circle(surface, (200, 255, 200, 60), centro_surface, raio_tela)
-            
-            # 5. Posiciona a superfície na tela, ajustando pelo raio da borda
-            pos_blit = (pos_tela[0] - raio_borda, pos_tela[1] - raio_borda)
-            tela.blit(surface, pos_blit)
+class CacheFundo:
+    '''
+    fundo (preto + retangulos dos biomas) desenhado uma vez numa Surface do tamanho da tela.
+    só é redesenhado quando muda algo que aparece nele: zoom/offset da camera, tamanho da tela
+    ou a cor/limites de algum bioma (variar_cores_biomas).
+    '''
+    def __init__(self):
+        self.chave = None
+        self.superficie = None
+
+    def _chave(self, tela, ambiente: Ambiente, camera: Camera) -> tuple:
+        return (
+            tela.get_size(), camera.zoom, camera.offset_x, camera.offset_y,
+            tuple(
+                (bioma.cor.r, bioma.cor.g, bioma.cor.b, tuple(bioma.limites.values()))
+                for bioma in ambiente.biomas
+            ),
+        )
+
+    def fundo(self, tela, ambiente: Ambiente, camera: Camera) -> pygame.Surface:
+        chave = self._chave(tela, ambiente, camera)
+        if chave != self.chave:
+            if self.superficie is None or self.superficie.get_size() != tela.get_size():
+                self.superficie = tela.copy()
+            self.superficie.fill(PRETO)
+            _desenhar_biomas(self.superficie, ambiente, camera)
+            self.chave = chave
+        return self.superficie
+
+
+_cache_fundo = CacheFundo()
 
-def desenhar_ambiente(tela, ambiente: Ambiente, camera: Camera):
+
+def _desenhar_biomas(tela, ambiente: Ambiente, camera: Camera):
     for bioma in ambiente.biomas:
         lim = bioma.limites
         cor_bioma = (bioma.cor.r, bioma.cor.g, bioma.cor.b)
@@ -177,226 +230,396 @@ def desenhar_ambiente(tela, ambiente: Ambiente, camera: Camera):
         
         retangulo = pygame.Rect(x_tela, y_tela, largura_tela, altura_tela)
         pygame.draw.rect(tela, cor_bioma, retangulo)
+
+
+def desenhar_ambiente(tela, ambiente: Ambiente, camera: Camera, cache: CacheFundo = None):
+    '''cobre a tela inteira com o fundo em cache (já inclui o preto fora dos biomas), dispensa o tela.fill'''
+    cache = cache if cache is not None else _cache_fundo
+    tela.blit(cache.fundo(tela, ambiente, camera), (0, 0))
         
-def desenhar_populacao(tela, populacao: list[Individuo], camera: Camera):
-    for individuo in populacao:
-        
-        pos_tela = camera.mundo_para_tela(individuo.gene.x, individuo.gene.y)
-        raio_tela = camera.raio_para_tela(RAIO_INDIVIDUO)
-        
-        cor = (individuo.gene.cor.r, individuo.gene.cor.g, individuo.gene.cor.b)
-        
-        pygame.draw.circle(tela, PRETO, pos_tela, raio_tela + 1, 1)
-        pygame.draw.circle(tela, cor, pos_tela, raio_tela)
+def desenhar_populacao(tela, populacao: Populacao, camera: Camera, cache: CacheSprites = None):
+    cache = cache if cache is not None else _cache_sprites
+    raio_tela = camera.raio_para_tela(RAIO_INDIVIDUO)
+    cache.preparar(raio_tela)
+    if len(populacao) == 0:
+        return
+
+    # só quem cai no retangulo visivel (com folga do raio) passa daqui: com zoom alto o resto
+    # do custo (cores, sprites, blits) fica proporcional ao que aparece na tela
+    x_inicio, y_inicio, x_fim, y_fim = camera.retangulo_visivel(*tela.get_size(), margem=raio_tela + 2)
+    xs, ys = populacao.x, populacao.y
+    visiveis = np.flatnonzero((xs >= x_inicio) & (xs <= x_fim) & (ys >= y_inicio) & (ys <= y_fim))
+    if len(visiveis) == 0:
+        return
+    if len(visiveis) < len(populacao):
+        xs, ys = xs[visiveis], ys[visiveis]
+        r, g, b = populacao.r[visiveis], populacao.g[visiveis], populacao.b[visiveis]
+    else:
+        r, g, b = populacao.r, populacao.g, populacao.b
+
+    # mesma conta do camera.mundo_para_tela, para todos de uma vez
+    xs = ((xs - camera.offset_x) * camera.zoom).astype(np.int64)
+    ys = ((ys - camera.offset_y) * camera.zoom).astype(np.int64)
+
+    cores = (r.astype(np.int32) << 16) | (g.astype(np.int32) << 8) | b
+    cores_unicas, indice_cor = np.unique(cores, return_inverse=True)
+
+    if len(cores_unicas) > cache.max_sprites:
+        # mais cores do que cabe no cache: desenha circulo a circulo
+        for x, y, cor in zip(xs.tolist(), ys.tolist(), cores.tolist()):
+            pygame.draw.circle(tela, PRETO, (x, y), raio_tela + 1, 1)
+            pygame.draw.circle(tela, (cor >> 16, (cor >> 8) & 0xFF, cor & 0xFF), (x, y), raio_tela)
+        return
+
+    # um sprite por cor distinta, o resto é só indice; o sprite é posicionado pelo canto
+    sprites = [cache.sprite(cor) for cor in cores_unicas.tolist()]
+    cantos = zip((xs - (raio_tela + 1)).tolist(), (ys - (raio_tela + 1)).tolist())
+    tela.blits(zip(map(sprites.__getitem__, indice_cor.tolist()), cantos), doreturn=False)
         
-def desenhar_info(tela, ano:int, pop_total: int, fonte):
+def desenhar_info(tela, ano:int, pop_total: int, fonte, estado: str = None):
     texto_ano = fonte.render(f"Ano: {ano}", True, BRANCO)
     texto_pop = fonte.render(f"População: {pop_total}", True, BRANCO)
     tela.blit(texto_ano, (10, 10))
     tela.blit(texto_pop, (10, 35))
+    if estado:
+        tela.blit(fonte.render(estado, True, BRANCO), (10, 60))
+
+
+# --- SIMULACAO EM SEGUNDO PLANO ---
+
+class Retrato:
+    '''copia do que a janela precisa para desenhar um ano, independente da simulacao que continua rodando'''
+    def __init__(self, simulacao: Simulacao):
+        self.ano = simulacao.ano
+        self.populacao = simulacao.populacao.copiar()
+
+        # só o que muda de um ano para o outro é copiado (cores dos biomas e posicao das fontes),
+        # o mapa de biomas e os limites continuam compartilhados
+        self.ambiente = copy.copy(simulacao.ambiente)
+        self.ambiente.biomas = []
+        for bioma in simulacao.ambiente.biomas:
+            copia = copy.copy(bioma)
+            copia.cor = copy.copy(bioma.cor)
+            copia.fontes_de_recurso = [copy.copy(fonte) for fonte in bioma.fontes_de_recurso]
+            self.ambiente.biomas.append(copia)
+
+
+class ExecutorSimulacao:
+    '''
+    roda a simulacao numa thread separada e publica um Retrato para a janela desenhar no ritmo dela.
+
+    >>> ritmo normal: um ano por quadro desenhado (como antes, a simulacao espera a janela pegar o retrato)
+    acelerado: a simulacao roda o mais rapido possivel e só publica 1 a cada `anos_por_quadro` anos
+    pausado: nada anda, a nao ser um ano por vez com avancar_um_ano()
+    '''
+    def __init__(self, simulacao: Simulacao, anos_max: int = NUMERO_DE_ANOS):
+        self.simulacao = simulacao
+        self.anos_max = anos_max
+        self.pausado = False
+        self.acelerado = False
+        self.anos_por_quadro = ANOS_POR_QUADRO_ACELERADO
+        self.terminou = False
+        self._passos = 0
+        self._parar = False
+        self._retrato = Retrato(simulacao)
+        self._retrato_entregue = False
+        self._condicao = threading.Condition()
+        self._thread = threading.Thread(target=self._rodar, name='simulacao', daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+
+    def parar(self):
+        '''interrompe a simulacao e espera a thread sair (observadores nao sao mais chamados depois disso)'''
+        self._alterar(_parar=True)
+        self._thread.join()
+
+    def retrato(self) -> Retrato:
+        '''ultimo ano publicado'''
+        with self._condicao:
+            self._retrato_entregue = True
+            self._condicao.notify_all()
+            return self._retrato
+
+    def alternar_pausa(self):
+        self._alterar(pausado=not self.pausado, _passos=0)
+
+    def avancar_um_ano(self):
+        '''só tem efeito pausado'''
+        if self.pausado:
+            self._alterar(_passos=self._passos + 1)
+
+    def alternar_acelerado(self):
+        self._alterar(acelerado=not self.acelerado)
+
+    def mudar_anos_por_quadro(self, fator: float):
+        self._alterar(anos_por_quadro=max(1, int(self.anos_por_quadro * fator)))
+
+    def descricao(self) -> str:
+        if self.pausado:
+            return 'PAUSADO [Espaço=continuar, →=avançar 1 ano]'
+        if self.acelerado:
+            return f'ACELERADO: 1 quadro a cada {self.anos_por_quadro} anos [↑/↓=mudar, A=normal]'
+        return ''
+
+    def _alterar(self, **valores):
+        with self._condicao:
+            for nome, valor in valores.items():
+                setattr(self, nome, valor)
+            self._condicao.notify_all()
+
+    def _pode_avancar(self) -> bool:
+        if self._parar:
+            return True
+        if self.pausado:
+            return self._passos > 0
+        if self.acelerado:
+            return True
+        return self._retrato_entregue
+
+    def _rodar(self):
+        simulacao = self.simulacao
+        while not (simulacao.extinta or simulacao.ano >= self.anos_max):
+            with self._condicao:
+                self._condicao.wait_for(self._pode_avancar)
+                if self._parar:
+                    return
+                passo = self.pausado
+                if passo:
+                    self._passos -= 1
+
+            simulacao.step()
+
+            fim = simulacao.extinta or simulacao.ano >= self.anos_max
+            if passo or fim or not self.acelerado or simulacao.ano % self.anos_por_quadro == 0:
+                retrato = Retrato(simulacao)
+                with self._condicao:
+                    self._retrato = retrato
+                    self._retrato_entregue = False
+
+        self._alterar(terminou=True)
     
 
+# --- REPLAY DE UMA GRAVACAO ---
+
+class ReprodutorGravacao:
+    '''
+    escolhe qual quadro de uma Gravacao aparece na janela, sem simular nada
+
+    >>> a posicao (em quadros, fracionaria) anda `velocidade` quadros por segundo de relogio,
+    para frente ou para tras. ir para qualquer ano é só mudar a posicao: a Gravacao le só aquele quadro.
+    ao chegar numa ponta da gravacao, pausa.
+    '''
+    def __init__(self, gravacao: Gravacao, velocidade: float = QUADROS_POR_SEGUNDO_REPLAY):
+        self.gravacao = gravacao
+        self.posicao = 0.0
+        self.velocidade = velocidade
+        self.sentido = 1
+        self.pausado = False
+
+    @property
+    def ultimo(self) -> int:
+        return len(self.gravacao) - 1
+
+    def avancar(self, segundos: float):
+        if self.pausado:
+            return
+        self.ir_para(self.posicao + self.sentido * self.velocidade * segundos)
+        if self.posicao in (0, self.ultimo):
+            self.pausado = True
+
+    def ir_para(self, posicao: float):
+        self.posicao = float(min(max(0, posicao), self.ultimo))
+
+    def ir_para_fracao(self, fracao: float):
+        self.ir_para(round(fracao * self.ultimo))
+
+    def passo(self, quadros: int):
+        '''anda `quadros` quadros inteiros (negativo volta) e pausa'''
+        self.pausado = True
+        self.ir_para(round(self.posicao) + quadros)
+
+    def alternar_pausa(self):
+        # dar play parado numa ponta recomeca do outro lado
+        if self.pausado and round(self.posicao) == (self.ultimo if self.sentido > 0 else 0):
+            self.ir_para(0 if self.sentido > 0 else self.ultimo)
+        self.pausado = not self.pausado
+
+    def inverter_sentido(self):
+        self.sentido = -self.sentido
+
+    def mudar_velocidade(self, fator: float):
+        self.velocidade = min(max(0.25, self.velocidade * fator), 10_000)
+
+    def quadro(self):
+        return self.gravacao.quadro(round(self.posicao))
+
+    def descricao(self) -> str:
+        estado = 'PAUSADO' if self.pausado else ('▶' if self.sentido > 0 else '◀')
+        return f'REPLAY {estado} {self.velocidade:g} quadros/s [Espaço, ←/→, ↑/↓, R=inverter, Home/End, clique na barra]'
+
+
+def _na_barra_tempo(tela, posicao: tuple[int, int]) -> bool:
+    return posicao[1] >= tela.get_height() - ALTURA_BARRA_TEMPO
+
+
+def desenhar_barra_tempo(tela, posicao: float, ultimo: int):
+    largura, altura = tela.get_size()
+    y = altura - ALTURA_BARRA_TEMPO
+    pygame.draw.rect(tela, (40, 40, 40), (0, y, largura, ALTURA_BARRA_TEMPO))
+    pygame.draw.rect(tela, (200, 200, 200), (0, y, int(largura * posicao / max(1, ultimo)), ALTURA_BARRA_TEMPO))
+
+
+def main_replay(diretorio: str):
+    '''revê uma rodada gravada com simulacao.py --gravacao, com a mesma camera e o mesmo desenho da janela normal'''
+    gravacao = Gravacao(diretorio)
+    pygame.init()
+    tela = pygame.display.set_mode((LARGURA_TELA, ALTURA_TELA))
+    pygame.display.set_caption(f'Replay: {diretorio} [Scroll=Zoom, Arrastar=Mover, clique na barra=ir para o ano]', '👥')
+    clock = pygame.time.Clock()
+    fonte = pygame.font.Font(None, 30)
+
+    camera = Camera()
+    reprodutor = ReprodutorGravacao(gravacao)
+    arrastando_barra = False
+
+    rodando = True
+    while rodando:
+        for evento in pygame.event.get():
+            if evento.type == pygame.QUIT:
+                rodando = False
+            if evento.type == pygame.KEYDOWN:
+                if evento.key == pygame.K_SPACE:
+                    reprodutor.alternar_pausa()
+                elif evento.key == pygame.K_RIGHT:
+                    reprodutor.passo(1)
+                elif evento.key == pygame.K_LEFT:
+                    reprodutor.passo(-1)
+                elif evento.key == pygame.K_PAGEUP:
+                    reprodutor.passo(100)
+                elif evento.key == pygame.K_PAGEDOWN:
+                    reprodutor.passo(-100)
+                elif evento.key == pygame.K_HOME:
+                    reprodutor.ir_para(0)
+                elif evento.key == pygame.K_END:
+                    reprodutor.ir_para(reprodutor.ultimo)
+                elif evento.key == pygame.K_UP:
+                    reprodutor.mudar_velocidade(2)
+                elif evento.key == pygame.K_DOWN:
+                    reprodutor.mudar_velocidade(0.5)
+                elif evento.key == pygame.K_r:
+                    reprodutor.inverter_sentido()
+
+            # a barra de tempo fica com os cliques e arrastos que comecam nela, o resto vai para a camera
+            if evento.type == pygame.MOUSEBUTTONDOWN and evento.button == 1 and _na_barra_tempo(tela, evento.pos):
+                arrastando_barra = True
+            elif evento.type == pygame.MOUSEBUTTONUP and evento.button == 1 and arrastando_barra:
+                arrastando_barra = False
+            elif not (evento.type == pygame.MOUSEMOTION and arrastando_barra):
+                camera.lidar_eventos(evento)
+                continue
+            if evento.type != pygame.MOUSEBUTTONUP:
+                reprodutor.ir_para_fracao(evento.pos[0] / tela.get_width())
+
+        quadro = reprodutor.quadro()
+        desenhar_ambiente(tela, quadro.ambiente, camera)
+        desenhar_fontes_recurso(tela, quadro.ambiente, camera)
+        desenhar_populacao(tela, quadro.populacao, camera)
+        desenhar_info(tela, quadro.ano, len(quadro.populacao), fonte, reprodutor.descricao())
+        desenhar_barra_tempo(tela, reprodutor.posicao, reprodutor.ultimo)
+        pygame.display.flip()
+
+        reprodutor.avancar(clock.tick(FPS) / 1000)
+
+    pygame.quit()
+
+
 # --- FUNCAO PRINCIPAL ---
 def main():
     pygame.init()
     tela = pygame.display.set_mode((LARGURA_TELA, ALTURA_TELA))
-    pygame.display.set_caption('Simulação de Evolução Genética [Scroll=Zoom, Arrastar=Mover]', '👥')
+    pygame.display.set_caption('Simulação de Evolução Genética [Scroll=Zoom, Arrastar=Mover, Espaço=Pausa, A=Acelerar]', '👥')
     clock = pygame.time.Clock()
     fonte = pygame.font.Font(None, 30)
     
     camera = Camera()
     
-    polar     = Bioma('polar',     0.25, Cor(102, 183, 255), energia_fornecida=200)
-    floresta  = Bioma('floresta',  0.23, Cor(34, 139, 34), energia_fornecida=40)
-    maritimo  = Bioma('marítimo',  0.25, Cor(28, 107, 160), energia_fornecida=50)
-    desertico = Bioma('desértico', 0.27, Cor(237, 201, 175), energia_fornecida=90)
-    # savanna   = Bioma('savanna',   0.5, Cor(189, 183, 107), energia_fornecida=200)
-    # pantano   = Bioma('pântano',   0.5, Cor(47, 79, 79), energia_fornecida=200)
-    # montanha  = Bioma('montanha',  0.10, Cor(139, 137, 137), energia_fornecida=20)
-    # tundra    = Bioma('tundra',    0.5, Cor(176, 224, 230), energia_fornecida=200)
-    # planicie  = Bioma('planície',  0.10, Cor(144, 238, 144), energia_fornecida=20)
-    # vulcanico = Bioma('vulcânico', 0.10, Cor(178, 34, 34), energia_fornecida=90)
-
-    ambiente = Ambiente(
-        AMBIENTE_X_MAX, AMBIENTE_Y_MAX,
-        [
-            maritimo, floresta, desertico, polar,
-            # savanna, pantano, montanha, tundra, planicie, vulcanico
-        ]
-    )
+    # a simulacao nao sabe nada do pygame: a janela só observa o estado dela a cada ano
+    simulacao = Simulacao()
     
-    ambiente._calcular_limites_biomas()
+    def observar_ano(sim: Simulacao):
+        print(f'Ano {sim.ano}: População = {len(sim.populacao)}')
     
-    for bioma in ambiente.biomas:
-        for _ in range(QTD_FONTES_POR_BIOMA):
-            lim = bioma.limites
-            x_rand = random.randint(lim['x_inicio'], lim['x_fim'])
-            y_rand = random.randint(lim['y_inicio'], lim['y_fim'])
-            fonte_obj = FonteDeRecurso(x_rand, y_rand, RAIO_FONTE_RECURSO, bioma.energia_fornecida)
-            bioma.fontes_de_recurso.append(fonte_obj)
+    simulacao.adicionar_observador(observar_ano)
     
-    populacao = cria_populacao_inicial(QTD_INICIAL_INDIVIDUOS, ambiente)
+    # o log por individuo vai sendo gravado em disco em blocos, sem acumular na memoria
+    registrador = None
+    if SALVAR_DADOS_INDIVIDUAIS:
+        registrador = RegistradorColunar(ARQUIVO_DADOS_INDIVIDUAIS, [bioma.nome for bioma in simulacao.ambiente.biomas])
+        simulacao.adicionar_observador(registrador)
     
-    rodando = True
-    ano_atual = 0
+    estatisticas = None
+    if SALVAR_ESTATISTICAS:
+        estatisticas = EstatisticasPorBioma(ARQUIVO_ESTATISTICAS, [bioma.nome for bioma in simulacao.ambiente.biomas])
+        simulacao.adicionar_observador(estatisticas)
     
-    dados_individuais_log = [] 
+    # a simulacao roda numa thread propria, a janela só desenha o ultimo ano publicado
+    executor = ExecutorSimulacao(simulacao, NUMERO_DE_ANOS)
+    executor.iniciar()
+
+    rodando = True
     
-    while rodando and ano_atual < NUMERO_DE_ANOS:
+    while rodando:
         for evento in pygame.event.get():
             if evento.type == pygame.QUIT:
                 rodando = False
+            if evento.type == pygame.KEYDOWN:
+                if evento.key == pygame.K_SPACE:
+                    executor.alternar_pausa()
+                elif evento.key == pygame.K_RIGHT:
+                    executor.avancar_um_ano()
+                elif evento.key == pygame.K_a:
+                    executor.alternar_acelerado()
+                elif evento.key == pygame.K_UP:
+                    executor.mudar_anos_por_quadro(2)
+                elif evento.key == pygame.K_DOWN:
+                    executor.mudar_anos_por_quadro(0.5)
             camera.lidar_eventos(evento)
-                
-        if not populacao:
-            print('>>> A POPULACAO FOI EXTINTA! <<<')
-            rodando = False
-            continue
-        
-        # --- LÓGICA DA SIMULAÇÃO (1 ANO) ---
-        
-        for bioma in ambiente.biomas:
-            for fonte_obj in bioma.fontes_de_recurso:
-                fonte_obj.mover(bioma.limites, INTENSIDADE_MOV_RECURSO)
-        variar_cores_biomas(ambiente, INTENSIDADE_VARIACAO_COR, ano_atual)
-        
-        # 1. Envelhecer e alimentar a população
-        for individuo in populacao: 
-            individuo.idade += 1
-            for bioma in ambiente.biomas:
-                for fonte_obj in bioma.fontes_de_recurso:
-                    dist_sq = (individuo.gene.x - fonte_obj.x)**2 + (individuo.gene.y - fonte_obj.y)**2
-                    if dist_sq <= fonte_obj.raio**2:
-                        individuo.energia += fonte_obj.energia_fornecida
-                        individuo.energia = min(individuo.energia, ENERGIA_MAXIMA)
-                        break
-                else:
-                    continue
-                break
-                
-        # 2. Mover a população
-        mover_populacao(populacao)
-        
-        # --- ESTRUTURA LÓGICA CORRIGIDA ---
-
-        # 3. Seleção Natural (por cor de camuflagem)
-        populacao_por_bioma = {bioma: [] for bioma in ambiente.biomas}
-        for individuo in populacao:
-            bioma_do_individuo = pega_bioma_do_individuo(individuo, ambiente)
-            if bioma_do_individuo:
-                populacao_por_bioma[bioma_do_individuo].append(individuo)
         
-        sobreviventes_gerais = []
-        for bioma, individuos_no_bioma in populacao_por_bioma.items():
-            if individuos_no_bioma:
-                selecao = SelecaoNatural(cor_alvo=bioma.cor)
-                sobreviventes_do_bioma = selecao.aplicar_selecao(individuos_no_bioma)
-                sobreviventes_gerais.extend(sobreviventes_do_bioma)
-                
-        populacao = sobreviventes_gerais
-        
-        # 4. Reprodução
-        novos_descendentes = []
-        aptos = [
-            ind for ind in populacao
-            if ind.idade >= IDADE_REPRODUTIVA and ind.energia >= CUSTO_REPRODUCAO
-        ]
-        random.shuffle(aptos)
-        
-        ja_reproduziu = set()
-        for individuo_a in aptos:
-            if individuo_a in ja_reproduziu:
-                continue
-
-            for individuo_b in aptos:
-                if individuo_a is not individuo_b and individuo_b not in ja_reproduziu:
-                    dist_x = individuo_a.gene.x - individuo_b.gene.x
-                    dist_y = individuo_a.gene.y - individuo_b.gene.y
-                    
-                    if (dist_x**2 + dist_y**2) <= DISTANCIA_REPRODUCAO**2:
-                        reproducao = ReproducaoSexuada(pai=individuo_a, mae=individuo_b)
-                        novo_gene = reproducao.reproduzir()
-                        novo_filho = Individuo(gene=novo_gene, idade=0, qtdfilhos=0, energia=ENERGIA_INICIAL)
-                        novos_descendentes.append(novo_filho)
-                        
-                        individuo_a.energia -= CUSTO_REPRODUCAO
-                        individuo_b.energia -= CUSTO_REPRODUCAO
-                        
-                        ja_reproduziu.add(individuo_a)
-                        ja_reproduziu.add(individuo_b)
-                        break
-        
-        populacao.extend(novos_descendentes)
-        
-        # 5. Morte por idade/fome e Controle Populacional
-        populacao = [ind for ind in populacao if ind.idade < IDADE_MAX and ind.energia > 0]
-
-        # 5.1 Controle de capacidade por bioma
-        populacao_por_bioma = {bioma: [] for bioma in ambiente.biomas}
-        for individuo in populacao:
-            bioma_do_individuo = pega_bioma_do_individuo(individuo, ambiente)
-            if bioma_do_individuo:
-                populacao_por_bioma[bioma_do_individuo].append(individuo)
-
-        populacao_controlada = []
-        for bioma, individuos_no_bioma in populacao_por_bioma.items():
-            if len(individuos_no_bioma) > bioma.capacidade_maxima:
-                sobreviventes_do_bioma = random.sample(individuos_no_bioma, bioma.capacidade_maxima)
-                populacao_controlada.extend(sobreviventes_do_bioma)
-            else:
-                populacao_controlada.extend(individuos_no_bioma)
-        
-        populacao = populacao_controlada
-
-        # 5.2 Controle de capacidade global
-        if len(populacao) > QTD_MAX_INDIVIDUOS:
-            populacao = random.sample(populacao, QTD_MAX_INDIVIDUOS)
-                
-        print(f'Ano {ano_atual+1}: População = {len(populacao)}')
-        
-        for individuo in populacao:
-            bioma_atual = pega_bioma_do_individuo(individuo, ambiente)
-            nome_bioma = bioma_atual.nome if bioma_atual else 'Nenhum'
-            
-            registro_individuo = {
-                'Ano': ano_atual + 1,
-                'ID_Individuo': individuo.id,
-                'Idade': individuo.idade,
-                'Energia': individuo.energia,
-                'X_Pos': individuo.gene.x,
-                'Y_Pos': individuo.gene.y,
-                'Cor_R': individuo.gene.cor.r,
-                'Cor_G': individuo.gene.cor.g,
-                'Cor_B': individuo.gene.cor.b,
-                'Bioma': nome_bioma,
-            }
-            dados_individuais_log.append(registro_individuo)
+        # lido antes de pegar o retrato: se ja tinha terminado, este é o ultimo ano
+        terminou = executor.terminou
+        retrato = executor.retrato()
 
         # --- FASE DE DESENHO ----
-        tela.fill(PRETO)
-        desenhar_ambiente(tela, ambiente, camera)
-        desenhar_fontes_recurso(tela, ambiente, camera)
-        desenhar_populacao(tela, populacao, camera)
-        desenhar_info(tela, ano_atual+1, len(populacao), fonte)
+        desenhar_ambiente(tela, retrato.ambiente, camera)
+        desenhar_fontes_recurso(tela, retrato.ambiente, camera)
+        desenhar_populacao(tela, retrato.populacao, camera)
+        desenhar_info(tela, retrato.ano, len(retrato.populacao), fonte, executor.descricao())
         
         pygame.display.flip()
         
+        if terminou:
+            if len(retrato.populacao) == 0:
+                print('>>> A POPULACAO FOI EXTINTA! <<<')
+            rodando = False
+        
         # --- CONTROLE DE TEMPO ---
         clock.tick(FPS)
-        ano_atual += 1
+    
+    # a thread precisa ter saido antes de fechar o registrador, que é chamado por ela
+    executor.parar()
     
     print("\n--- SALVANDO DADOS GRANULARES DA SIMULAÇÃO ---")
     
-    if False:
-        if dados_individuais_log:
-            df_simulacao = pd.DataFrame(dados_individuais_log)
-            
-            # Salva em CSV, que é muito mais eficiente para arquivos grandes
-            nome_arquivo_csv = "dados_individuais_simulacao.csv"
-            df_simulacao.to_csv(nome_arquivo_csv, index=False)
-            print(f"Dados salvos com sucesso em '{nome_arquivo_csv}'")
+    if registrador is not None:
+        registrador.fechar()
+        if registrador.total_registros:
+            print(f"Dados salvos com sucesso em '{registrador.caminho}'")
         else:
             print("Nenhum dado foi gerado para salvar.")
+    if estatisticas is not None:
+        estatisticas.fechar()
+        print(f"Estatisticas por bioma salvas em '{estatisticas.caminho}'")
     
     print("\n--- SIMULAÇÃO FINALIZADA ---")
     print("A janela final está sendo exibida. Pressione qualquer tecla para fechar.")
@@ -418,4 +641,11 @@ def main():
     pygame.quit()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Janela da simulacao (ou replay de uma rodada gravada).')
+    parser.add_argument('--replay', default=None, metavar='DIRETORIO',
+                        help='revê uma gravacao feita com simulacao.py --gravacao em vez de simular')
+    args = parser.parse_args()
+    if args.replay:
+        main_replay(args.replay)
+    else:
+        main()
\ No newline at end of file
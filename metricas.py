@@ -0,0 +1,94 @@
+import json
+import sys
+import time
+from collections import deque
+import numpy as np
+
+CAUSAS_DE_MORTE = ('selecao', 'idade', 'fome', 'capacidade_bioma', 'capacidade_global', 'fora_do_bioma')
+
+
+class SinkMemoria():
+    '''guarda os ultimos `capacidade` registros num buffer circular'''
+    def __init__(self, capacidade: int = 1000):
+        self.registros = deque(maxlen=capacidade)
+
+    def __call__(self, registro: dict):
+        self.registros.append(registro)
+
+    def fechar(self):
+        pass
+
+
+class SinkJsonl():
+    '''escreve um registro por linha (json lines), linha a linha, para acompanhar com tail -f'''
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'w', encoding='utf-8', buffering=1)
+
+    def __call__(self, registro: dict):
+        self._arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+class Metricas():
+    '''
+    metricas ao vivo de cada ano da simulacao
+
+    >>> ligada com simulacao.metricas = Metricas(SinkMemoria(), SinkJsonl('metricas.jsonl')).
+    com simulacao.metricas = None (padrao) o step() nao mede nada, o custo é só um `if` por fase.
+
+    a cada ano emite para todos os sinks um dict com: tempo de cada fase, populacao por bioma,
+    nascimentos, mortes por causa, realocacoes das colunas da Populacao e a variacao de blocos
+    de memoria alocados pelo interpretador (sys.getallocatedblocks).
+    '''
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+        self._tempos = {}
+        self._contadores = {}
+        self._inicio_ano = 0.0
+        self._blocos_alocados = sys.getallocatedblocks()
+        self._realocacoes = 0
+
+    def iniciar_ano(self):
+        self._tempos = {}
+        self._contadores = {'nascimentos': 0, **{f'mortes_{causa}': 0 for causa in CAUSAS_DE_MORTE}}
+        self._inicio_ano = time.perf_counter()
+
+    def tempo_fase(self, nome: str, segundos: float):
+        self._tempos[nome] = self._tempos.get(nome, 0.0) + segundos
+
+    def contar(self, nome: str, quantidade: int):
+        self._contadores[nome] = self._contadores.get(nome, 0) + int(quantidade)
+
+    def finalizar_ano(self, simulacao):
+        populacao = simulacao.populacao
+        nomes_biomas = [bioma.nome for bioma in simulacao.ambiente.biomas]
+        # bioma + 1 para o SEM_BIOMA (-1) cair na posicao 0
+        por_bioma = np.bincount(populacao.bioma.astype(np.int64) + 1, minlength=len(nomes_biomas) + 1)
+
+        blocos_alocados = sys.getallocatedblocks()
+        realocacoes = populacao.realocacoes
+
+        registro = {
+            'ano': simulacao.ano,
+            'tempo_total_ms': (time.perf_counter() - self._inicio_ano) * 1000,
+            'tempo_fases_ms': {nome: segundos * 1000 for nome, segundos in self._tempos.items()},
+            'populacao': len(populacao),
+            'populacao_por_bioma': dict(zip(nomes_biomas, por_bioma[1:].tolist())),
+            'nascimentos': self._contadores['nascimentos'],
+            'mortes': {causa: self._contadores[f'mortes_{causa}'] for causa in CAUSAS_DE_MORTE},
+            'realocacoes_populacao': max(0, realocacoes - self._realocacoes),
+            'blocos_alocados_delta': blocos_alocados - self._blocos_alocados,
+        }
+        self._blocos_alocados = blocos_alocados
+        self._realocacoes = realocacoes
+
+        for sink in self.sinks:
+            sink(registro)
+        return registro
+
+    def fechar(self):
+        for sink in self.sinks:
+            sink.fechar()
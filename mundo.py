@@ -0,0 +1,299 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+import numpy as np
+from populacao import Populacao, ContadorIds, COLUNAS
+from individuos import Mutacao
+from simulacao import Simulacao, Configuracao, COLUNAS_MIGRANTES, cria_ambiente_padrao, NUMERO_DE_ANOS
+
+
+class PopulacaoEmDisco(Populacao):
+    '''
+    Populacao com as colunas em arquivos .npy mapeados em memoria (np.memmap)
+
+    >>> descarregar() grava as colunas e solta os mapeamentos: a populacao passa a ocupar só disco
+    e o sistema operacional pode devolver a memoria. carregar() mapeia os arquivos de novo, e as
+    paginas só sao lidas quando alguma fase usa as colunas.
+
+    quando a capacidade cresce, cada coluna ganha um arquivo novo e o antigo é apagado.
+    '''
+    def __init__(self, diretorio: str, capacidade: int = 1024):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        self._geracao = 0
+        self._arquivos = {}
+        super().__init__(capacidade)
+
+    @classmethod
+    def copiar_de(cls, diretorio: str, populacao: Populacao, capacidade: int = None) -> 'PopulacaoEmDisco':
+        em_disco = cls(diretorio, capacidade=max(populacao.capacidade, capacidade or 0))
+        em_disco.adicionar(**{nome: getattr(populacao, nome) for nome in COLUNAS})
+        return em_disco
+
+    def _nova_coluna(self, nome: str, capacidade: int, tipo) -> np.ndarray:
+        caminho = os.path.join(self.diretorio, f'{nome}.{self._geracao}.npy')
+        self._arquivos[nome] = caminho
+        # o arquivo novo é esparso: as paginas zeradas nao ocupam disco nem memoria ate serem escritas
+        return np.lib.format.open_memmap(caminho, mode='w+', dtype=tipo, shape=(capacidade,))
+
+    def _garantir_capacidade(self, necessaria: int):
+        if necessaria <= self.capacidade:
+            return
+        antigos = list(self._arquivos.values())
+        self._geracao += 1
+        super()._garantir_capacidade(necessaria)
+        # no linux o arquivo apagado continua valendo para quem ainda tiver uma view dele
+        for caminho in antigos:
+            os.remove(caminho)
+
+    @property
+    def residente(self) -> bool:
+        return bool(self._dados)
+
+    def descarregar(self):
+        '''grava e solta as colunas (a populacao nao pode ser usada ate carregar())'''
+        for coluna in self._dados.values():
+            coluna.flush()
+        self._dados = {}
+
+    def carregar(self):
+        if not self.residente:
+            self._dados = {nome: np.load(caminho, mmap_mode='r+') for nome, caminho in self._arquivos.items()}
+
+    def bytes_em_disco(self) -> int:
+        return sum(os.stat(caminho).st_blocks * 512 for caminho in self._arquivos.values())
+
+
+class SimulacaoBloco(Simulacao):
+    '''
+    Simulacao de um bloco do MundoEmBlocos: o seu Ambiente, as suas fontes e os seus individuos
+
+    >>> o bloco vai de 0 ate tamanho_x - 1 (e tamanho_y - 1), a area coberta pelos biomas, entao
+    os blocos vizinhos se encostam sem nenhuma faixa fora de bioma entre eles.
+
+    nas bordas com outro bloco nem o movimento nem a mutacao dos filhos param no limite: quem passa
+    da borda sai da populacao logo depois do movimento (ou, se nasceu do lado de fora, logo depois
+    da reproducao) e fica em `saindo` (coordenadas deste bloco), para o mundo entregar ao bloco
+    vizinho. nas bordas do mundo os dois param no limite, como na Simulacao.
+    '''
+    def __init__(self, *args, vizinhos: tuple[bool, bool, bool, bool] = (False, False, False, False), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.vizinhos = vizinhos
+        self.largura = self.ambiente.tamanho_x
+        self.altura = self.ambiente.tamanho_y
+        self.limites_movimento = self._limites(vizinhos, self.config.intensidade_migracao)
+        x_min, y_min, x_max, y_max = self._limites(vizinhos, self.config.intensidade_mutacao)
+        self.mutacao = Mutacao(
+            intensidade=self.config.intensidade_mutacao, taxa=self.config.taxa_mutacao,
+            x_min=x_min, y_min=y_min, x_max=x_max, y_max=y_max,
+        )
+        self.saindo = None
+
+    def _limites(self, vizinhos: tuple[bool, bool, bool, bool], alcance: int) -> tuple[int, int, int, int]:
+        '''(x_min, y_min, x_max, y_max): `alcance` alem da borda onde ha vizinho, o limite do ambiente onde nao ha'''
+        esquerda, cima, direita, baixo = vizinhos
+        return (
+            -alcance if esquerda else 0,
+            -alcance if cima else 0,
+            self.largura - 1 + alcance if direita else self.ambiente.tamanho_x,
+            self.altura - 1 + alcance if baixo else self.ambiente.tamanho_y,
+        )
+
+    def _fase_movimento(self):
+        '''2. Mover a população (e separar quem cruzou para outro bloco)'''
+        super()._fase_movimento()
+        self._separar_saindo()
+
+    def _fase_reproducao(self):
+        '''4. Reprodução (e separar os filhos que nasceram em outro bloco)'''
+        super()._fase_reproducao()
+        self._separar_saindo()
+
+    def _separar_saindo(self):
+        populacao = self.populacao
+        esquerda, cima, direita, baixo = self.vizinhos
+        fora = np.zeros(len(populacao), dtype=bool)
+        if esquerda:
+            fora |= populacao.x < 0
+        if cima:
+            fora |= populacao.y < 0
+        if direita:
+            fora |= populacao.x >= self.largura
+        if baixo:
+            fora |= populacao.y >= self.altura
+        if not fora.any():
+            return
+        saindo = {nome: getattr(populacao, nome)[fora] for nome in (*COLUNAS_MIGRANTES, 'id')}
+        if self.saindo is not None:
+            saindo = {nome: np.concatenate((self.saindo[nome], valores)) for nome, valores in saindo.items()}
+        self.saindo = saindo
+        self._compactar(~fora)
+
+    def descarregar(self):
+        self._membros = None
+        self.populacao.descarregar()
+
+    def carregar(self):
+        self.populacao.carregar()
+
+
+class MundoEmBlocos():
+    '''
+    mundo grande dividido em `colunas` x `linhas` blocos, cada um do tamanho do ambiente do config
+
+    >>> cada bloco é uma SimulacaoBloco com o seu Ambiente, fontes e populacao (PopulacaoEmDisco).
+    só os `max_residentes` blocos usados mais recentemente ficam com as colunas mapeadas; os
+    outros sao descarregados para os arquivos e carregados de novo quando chega a vez deles.
+    blocos sem ninguem (inativos) nem sao carregados nem rodam, ate alguem chegar neles.
+
+    quem cruza a borda de um bloco passa o resto do ano em transito e entra no bloco vizinho no
+    comeco do ano seguinte, entao a ordem em que os blocos rodam nao muda o resultado.
+    o mapa de biomas (igual em todos os blocos) é um array só, compartilhado, e o ContadorIds
+    tambem: quem cruza leva o id junto, entao os ids nao podem repetir entre blocos.
+    '''
+    def __init__(self,
+                 colunas: int,
+                 linhas: int,
+                 diretorio: str = None,
+                 semente: int = None,
+                 config: Configuracao = None,
+                 qtd_inicial_por_bloco: int = None,
+                 max_residentes: int = 8,
+                 ):
+        self.config = config if config is not None else Configuracao()
+        self.colunas = colunas
+        self.linhas = linhas
+        self.max_residentes = max(1, max_residentes)
+        self._diretorio_temporario = diretorio is None
+        self.diretorio = diretorio if diretorio is not None else tempfile.mkdtemp(prefix='mundo_')
+        self.ano = 0
+        self.carregamentos = 0
+
+        sequencia = np.random.SeedSequence(semente)
+        self.semente = sequencia.entropy
+        self.blocos = {}
+        self._residentes = OrderedDict()
+        self._em_transito = {}
+        self.ids = ContadorIds()
+        mapa_biomas = None
+        for filha, (coluna, linha) in zip(sequencia.spawn(colunas * linhas),
+                                         [(c, l) for l in range(linhas) for c in range(colunas)]):
+            ambiente = cria_ambiente_padrao(self.config)
+            if mapa_biomas is None:
+                mapa_biomas = ambiente.mapa_biomas
+            ambiente.mapa_biomas = mapa_biomas
+            bloco = SimulacaoBloco(
+                ambiente, qtd_inicial_por_bloco, int(filha.generate_state(1, np.uint64)[0]), self.config,
+                vizinhos=(coluna > 0, linha > 0, coluna < colunas - 1, linha < linhas - 1), ids=self.ids,
+            )
+            bloco.populacao = PopulacaoEmDisco.copiar_de(
+                os.path.join(self.diretorio, f'bloco_{coluna}_{linha}'), bloco.populacao, self.config.qtd_max_individuos,
+            )
+            self.blocos[(coluna, linha)] = bloco
+            self._marcar_residente((coluna, linha))
+
+    @property
+    def populacao_total(self) -> int:
+        return sum(len(bloco.populacao) for bloco in self.blocos.values())
+
+    @property
+    def residentes(self) -> int:
+        return len(self._residentes)
+
+    def bytes_em_disco(self) -> int:
+        return sum(bloco.populacao.bytes_em_disco() for bloco in self.blocos.values())
+
+    def _marcar_residente(self, chave: tuple[int, int]):
+        '''carrega o bloco se preciso e descarrega o usado ha mais tempo se passou de max_residentes'''
+        bloco = self.blocos[chave]
+        if chave in self._residentes:
+            self._residentes.move_to_end(chave)
+            return
+        if not bloco.populacao.residente:
+            bloco.carregar()
+            self.carregamentos += 1
+        self._residentes[chave] = True
+        while len(self._residentes) > self.max_residentes:
+            antiga, _ = self._residentes.popitem(last=False)
+            self.blocos[antiga].descarregar()
+
+    def _despachar(self, chave: tuple[int, int], saindo: dict[str, np.ndarray]):
+        '''separa quem saiu do bloco `chave` pelo bloco de destino, já nas coordenadas do destino'''
+        bloco = self.blocos[chave]
+        coluna, linha = chave
+        x_mundo = saindo['x'].astype(np.int64) + coluna * bloco.largura
+        y_mundo = saindo['y'].astype(np.int64) + linha * bloco.altura
+        colunas_destino, linhas_destino = x_mundo // bloco.largura, y_mundo // bloco.altura
+        for destino in set(zip(colunas_destino.tolist(), linhas_destino.tolist())):
+            vao = (colunas_destino == destino[0]) & (linhas_destino == destino[1])
+            migrantes = {nome: valores[vao] for nome, valores in saindo.items()}
+            migrantes['x'] = x_mundo[vao] - destino[0] * bloco.largura
+            migrantes['y'] = y_mundo[vao] - destino[1] * bloco.altura
+            self._em_transito.setdefault(destino, []).append(migrantes)
+
+    def step(self) -> bool:
+        '''avanca um ano em todos os blocos ocupados, retorna False se o mundo inteiro estiver extinto'''
+        chegadas, self._em_transito = self._em_transito, {}
+        for chave, bloco in self.blocos.items():
+            if bloco.extinta and chave not in chegadas:
+                continue
+            self._marcar_residente(chave)
+            for migrantes in chegadas.get(chave, []):
+                bloco.imigrar(migrantes)
+            bloco.step()
+            if bloco.saindo is not None:
+                self._despachar(chave, bloco.saindo)
+                bloco.saindo = None
+        self.ano += 1
+        return self.populacao_total > 0 or bool(self._em_transito)
+
+    def run(self, n_anos: int, observador=None) -> int:
+        for _ in range(n_anos):
+            if not self.step():
+                break
+            if observador is not None:
+                observador(self)
+        return self.ano
+
+    def fechar(self):
+        '''apaga os arquivos dos blocos se o diretorio foi criado aqui'''
+        for bloco in self.blocos.values():
+            if bloco.populacao.residente:
+                bloco.descarregar()
+        self._residentes.clear()
+        if self._diretorio_temporario:
+            shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mundo em blocos, com as populacoes dos blocos em arquivos mapeados.')
+    parser.add_argument('--colunas', type=int, default=4)
+    parser.add_argument('--linhas', type=int, default=4)
+    parser.add_argument('--anos', type=int, default=NUMERO_DE_ANOS)
+    parser.add_argument('--semente', type=int, default=None)
+    parser.add_argument('--residentes', type=int, default=8, help='quantos blocos ficam carregados ao mesmo tempo')
+    parser.add_argument('--diretorio', default=None, help='onde ficam os arquivos dos blocos (padrao: temporario, apagado no fim)')
+    parser.add_argument('--intervalo-log', type=int, default=10)
+    args = parser.parse_args()
+
+    def imprimir_progresso(mundo):
+        if mundo.ano % args.intervalo_log == 0:
+            print(f'Ano {mundo.ano}: População = {mundo.populacao_total} '
+                  f'({mundo.residentes} blocos carregados, {mundo.bytes_em_disco() / 2**20:.1f} MB em disco)')
+
+    inicio = time.perf_counter()
+    with MundoEmBlocos(args.colunas, args.linhas, args.diretorio, args.semente, max_residentes=args.residentes) as mundo:
+        if args.semente is None:
+            print(f'Semente: {mundo.semente} (use --semente para repetir esta rodada)')
+        mundo.run(args.anos, imprimir_progresso)
+        print(f'{args.colunas}x{args.linhas} blocos, {mundo.ano} anos em {time.perf_counter() - inicio:.2f}s '
+              f'({mundo.carregamentos} carregamentos de bloco)')
@@ -0,0 +1,210 @@
+import numpy as np
+from ambiente import SEM_BIOMA
+
+# tipo de cada coluna, pensado para caber na faixa dos valores da simulacao
+COLUNAS = {
+    'id': np.int64,
+    'idade': np.int16,
+    'energia': np.int32,
+    'x': np.int32,
+    'y': np.int32,
+    'r': np.uint8,
+    'g': np.uint8,
+    'b': np.uint8,
+    'bioma': np.int8,       # indice em ambiente.biomas, -1 = fora de qualquer bioma
+}
+
+
+def _coluna(nome: str) -> property:
+    def ler(self) -> np.ndarray:
+        return self._dados[nome][:self.tamanho]
+
+    def escrever(self, valores):
+        self._dados[nome][:self.tamanho] = valores
+
+    return property(ler, escrever, doc=f'coluna `{nome}` dos individuos vivos (view, sem copia)')
+
+
+class ContadorIds():
+    '''
+    proximo id livre de uma simulacao
+
+    >>> cada Simulacao tem o seu (e o checkpoint guarda ele), entao a mesma semente da os mesmos ids
+    mesmo com varias rodadas no mesmo processo. simulacoes que trocam individuos entre si mantendo
+    os ids (os blocos de um MundoEmBlocos) dividem um contador só.
+    '''
+    def __init__(self, proximo: int = 0):
+        self.proximo = proximo
+
+    def reservar(self, quantidade: int) -> np.ndarray:
+        '''`quantidade` ids novos e consecutivos'''
+        primeiro = self.proximo
+        self.proximo += quantidade
+        return np.arange(primeiro, primeiro + quantidade, dtype=np.int64)
+
+
+class Populacao():
+    '''
+    populacao guardada em colunas (structure of arrays)
+
+    >>> cada atributo de todos os individuos fica num array numpy contiguo, em vez de
+    um Individuo + Genes + Cor por individuo. a linha i de todas as colunas é o individuo i.
+
+    as colunas tem folga no fim (capacidade), entao adicionar é O(novos) amortizado e
+    compactar remove os mortos sem realocar.
+    '''
+    def __init__(self, capacidade: int = 1024):
+        self.tamanho = 0
+        self.realocacoes = 0
+        self._dados = {nome: self._nova_coluna(nome, max(1, capacidade), tipo) for nome, tipo in COLUNAS.items()}
+
+    id = _coluna('id')
+    idade = _coluna('idade')
+    energia = _coluna('energia')
+    x = _coluna('x')
+    y = _coluna('y')
+    r = _coluna('r')
+    g = _coluna('g')
+    b = _coluna('b')
+    bioma = _coluna('bioma')
+
+    def __len__(self) -> int:
+        return self.tamanho
+
+    @property
+    def capacidade(self) -> int:
+        return len(self._dados['id'])
+
+    @staticmethod
+    def bytes_por_individuo() -> int:
+        return sum(np.dtype(tipo).itemsize for tipo in COLUNAS.values())
+
+    def _nova_coluna(self, nome: str, capacidade: int, tipo) -> np.ndarray:
+        '''aloca uma coluna zerada (subclasses podem alocar em outro lugar, ex.: memoria compartilhada)'''
+        return np.zeros(capacidade, dtype=tipo)
+
+    def _garantir_capacidade(self, necessaria: int):
+        if necessaria <= self.capacidade:
+            return
+        nova_capacidade = max(necessaria, 2 * self.capacidade)
+        self.realocacoes += 1
+        for nome, coluna in self._dados.items():
+            nova = self._nova_coluna(nome, nova_capacidade, coluna.dtype)
+            nova[:self.tamanho] = coluna[:self.tamanho]
+            self._dados[nome] = nova
+
+    def adicionar(self, x, y, r, g, b, idade, energia, id, bioma=SEM_BIOMA) -> slice:
+        '''
+        adiciona um lote de individuos no fim da populacao, todos os argumentos sao arrays do mesmo tamanho
+        (ou escalares, repetidos para o lote todo). ids novos saem do ContadorIds da simulacao.
+        retorna o slice das linhas novas.
+        '''
+        quantidade = len(x)
+        inicio, fim = self.tamanho, self.tamanho + quantidade
+        self._garantir_capacidade(fim)
+
+        valores = {
+            'id': id, 'idade': idade, 'energia': energia,
+            'x': x, 'y': y, 'r': r, 'g': g, 'b': b, 'bioma': bioma,
+        }
+        for nome, valor in valores.items():
+            self._dados[nome][inicio:fim] = valor
+
+        self.tamanho = fim
+        return slice(inicio, fim)
+
+    def compactar(self, manter: np.ndarray):
+        '''
+        mantem apenas as linhas indicadas, na mesma ordem
+        `manter` pode ser uma mascara booleana do tamanho da populacao ou um array de indices
+        '''
+        manter = np.asarray(manter)
+        if manter.dtype == bool:
+            manter = np.flatnonzero(manter)
+
+        quantidade = len(manter)
+        for coluna in self._dados.values():
+            coluna[:quantidade] = coluna[:self.tamanho][manter]
+        self.tamanho = quantidade
+
+    @classmethod
+    def sobre_colunas(cls, colunas: dict[str, np.ndarray]) -> 'Populacao':
+        '''Populacao cujas colunas sao os proprios arrays de `colunas` (views, sem copia), todos do mesmo tamanho'''
+        populacao = cls.__new__(cls)
+        populacao._dados = {nome: colunas[nome] for nome in COLUNAS}
+        populacao.tamanho = len(populacao._dados['id'])
+        populacao.realocacoes = 0
+        return populacao
+
+    def copiar(self) -> 'Populacao':
+        '''copia independente só das linhas vivas (sem a folga de capacidade)'''
+        copia = Populacao(capacidade=self.tamanho)
+        for nome, coluna in self._dados.items():
+            copia._dados[nome][:self.tamanho] = coluna[:self.tamanho]
+        copia.tamanho = self.tamanho
+        return copia
+
+
+class MembrosPorBioma():
+    '''
+    linhas da populacao em cada bioma, mantidas de uma fase para a outra
+
+    >>> em vez de reagrupar a populacao inteira a cada fase (argsort da coluna bioma), um grupo
+    só muda quando alguem cruza a fronteira dele (mover), nasce nele (adicionar) ou morre (compactar).
+    as linhas de cada grupo ficam em ordem crescente, a mesma ordem do reagrupamento completo.
+
+    grupos[i] sao as linhas do bioma i, grupos[SEM_BIOMA] (o ultimo) as de quem esta fora de qualquer bioma.
+    quem altera a populacao precisa avisar aqui logo em seguida, com as mesmas linhas.
+    '''
+    def __init__(self, populacao: Populacao, qtd_biomas: int):
+        self.populacao = populacao
+        self.qtd_biomas = qtd_biomas
+        self.reagrupar()
+
+    def reagrupar(self):
+        '''refaz todos os grupos a partir da coluna bioma'''
+        bioma = self.populacao.bioma
+        ordem = np.argsort(bioma, kind='stable')
+        # bioma + 1 para o SEM_BIOMA (-1) cair na posicao 0
+        fim_de_cada = np.cumsum(np.bincount(bioma.astype(np.int64) + 1, minlength=self.qtd_biomas + 1))
+        grupos = np.split(ordem, fim_de_cada[:-1])
+        self.grupos = grupos[1:] + grupos[:1]
+        self.tamanho = len(self.populacao)
+
+    def ocupados(self) -> list[tuple[int, np.ndarray]]:
+        '''(indice do bioma, linhas nele) para cada bioma ocupado, com SEM_BIOMA por ultimo'''
+        ocupados = [(indice, linhas) for indice, linhas in enumerate(self.grupos[:-1]) if len(linhas)]
+        if len(self.grupos[SEM_BIOMA]):
+            ocupados.append((SEM_BIOMA, self.grupos[SEM_BIOMA]))
+        return ocupados
+
+    def mover(self, bioma_antigo: np.ndarray):
+        '''depois que a coluna bioma mudou: só os grupos com alguem saindo ou chegando sao refeitos'''
+        bioma = self.populacao.bioma
+        mudou = np.flatnonzero(bioma_antigo != bioma)
+        if len(mudou) == 0:
+            return
+        destinos = bioma[mudou]
+        for indice in np.unique(np.concatenate((bioma_antigo[mudou], destinos))).tolist():
+            grupo = self.grupos[indice]
+            ficaram = grupo[bioma[grupo] == indice]
+            self.grupos[indice] = np.sort(np.concatenate((ficaram, mudou[destinos == indice])))
+
+    def adicionar(self, linhas: slice, biomas):
+        '''depois de Populacao.adicionar: as linhas novas (as maiores) vao para o fim do grupo de cada uma'''
+        novas = np.arange(linhas.start, linhas.stop)
+        biomas = np.broadcast_to(np.asarray(biomas), novas.shape)
+        for indice in np.unique(biomas).tolist():
+            self.grupos[indice] = np.concatenate((self.grupos[indice], novas[biomas == indice]))
+        self.tamanho = linhas.stop
+
+    def compactar(self, manter: np.ndarray):
+        '''depois de Populacao.compactar(manter): tira os mortos e renumera as linhas'''
+        manter = np.asarray(manter)
+        if manter.dtype != bool:
+            mascara = np.zeros(self.tamanho, dtype=bool)
+            mascara[manter] = True
+            manter = mascara
+        nova_linha = np.cumsum(manter) - 1
+        self.grupos = [nova_linha[grupo[manter[grupo]]] for grupo in self.grupos]
+        self.tamanho = int(nova_linha[-1] + 1) if len(nova_linha) else 0
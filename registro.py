@@ -0,0 +1,202 @@
+import csv
+import os
+import queue
+import threading
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# coluna do log -> (coluna da Populacao, tipo). 'Ano' vem da simulacao, nao da populacao
+COLUNAS_LOG = {
+    'Ano': (None, np.int32),
+    'ID_Individuo': ('id', np.int64),
+    'Idade': ('idade', np.int16),
+    'Energia': ('energia', np.int32),
+    'X_Pos': ('x', np.int32),
+    'Y_Pos': ('y', np.int32),
+    'Cor_R': ('r', np.uint8),
+    'Cor_G': ('g', np.uint8),
+    'Cor_B': ('b', np.uint8),
+    'Bioma': ('bioma', np.int8),
+}
+TIPO_REGISTRO = np.dtype([(nome, tipo) for nome, (_, tipo) in COLUNAS_LOG.items()])
+
+FORMATOS = ('parquet', 'binario', 'csv')
+EXTENSOES = {'.parquet': 'parquet', '.csv': 'csv', '.bin': 'binario'}
+FORMATO_PADRAO = 'parquet' if pa is not None else 'binario'
+
+TAMANHO_BLOCO = 500_000
+BLOCOS_EM_ESPERA = 2
+
+
+class RegistradorColunar():
+    '''
+    log por individuo e por ano, gravado em disco aos poucos
+
+    >>> os registros vao para um bloco colunar de tamanho fixo; quando o bloco enche ele é
+    entregue a um thread escritor, que grava enquanto a simulacao segue. a fila entre os dois
+    é limitada, entao a memoria usada nao depende de quantos anos a simulacao roda.
+
+    formatos:
+        parquet -> um row group por bloco (precisa do pyarrow)
+        binario -> nomes dos biomas + um np.save por bloco, em sequencia no mesmo arquivo (ver ler_binario)
+        csv     -> mesmas colunas do antigo DataFrame, com o nome do bioma
+
+    sem `formato`, ele sai da extensao do caminho; se o caminho nao tiver extensao, usa o
+    FORMATO_PADRAO e acrescenta a extensao dele.
+
+    pode ser usado direto como observador da Simulacao.
+    '''
+    def __init__(self, caminho: str, nomes_biomas: list[str], formato: str = None,
+                 tamanho_bloco: int = TAMANHO_BLOCO):
+        extensao = os.path.splitext(caminho)[1].lower()
+        if formato is None and not extensao:
+            formato = FORMATO_PADRAO
+            caminho += next(ext for ext, nome in EXTENSOES.items() if nome == formato)
+        elif formato is None:
+            formato = EXTENSOES.get(extensao, 'binario')
+        if formato not in FORMATOS:
+            raise ValueError(f"formato '{formato}' desconhecido, use um de {FORMATOS}")
+        if formato == 'parquet' and pa is None:
+            raise ImportError("o formato 'parquet' precisa do pyarrow instalado, use 'binario' ou 'csv'")
+
+        self.caminho = caminho
+        self.formato = formato
+        self.nomes_biomas = list(nomes_biomas)
+        self.tamanho_bloco = tamanho_bloco
+        self.total_registros = 0
+
+        self._bloco = np.empty(tamanho_bloco, dtype=TIPO_REGISTRO)
+        self._ocupado = 0
+        self._fila = queue.Queue(maxsize=BLOCOS_EM_ESPERA)
+        self._erro = None
+        self._escritor = threading.Thread(target=self._escrever, name='registrador-colunar', daemon=True)
+        self._escritor.start()
+
+    def __call__(self, simulacao):
+        self.registrar(simulacao.ano, simulacao.populacao)
+
+    def registrar(self, ano: int, populacao):
+        '''copia o estado atual da populacao para o bloco, enviando os blocos cheios para o escritor'''
+        self._verificar_erro()
+
+        inicio = 0
+        while inicio < len(populacao):
+            quantidade = min(len(populacao) - inicio, self.tamanho_bloco - self._ocupado)
+            destino = self._bloco[self._ocupado:self._ocupado + quantidade]
+            for nome, (coluna, _) in COLUNAS_LOG.items():
+                if coluna is None:
+                    destino[nome] = ano
+                else:
+                    destino[nome] = getattr(populacao, coluna)[inicio:inicio + quantidade]
+
+            self._ocupado += quantidade
+            inicio += quantidade
+            if self._ocupado == self.tamanho_bloco:
+                self._enviar_bloco()
+
+        self.total_registros += len(populacao)
+
+    def _enviar_bloco(self):
+        if self._ocupado:
+            self._fila.put(self._bloco[:self._ocupado])
+            self._bloco = np.empty(self.tamanho_bloco, dtype=TIPO_REGISTRO)
+            self._ocupado = 0
+
+    def fechar(self):
+        '''grava o que sobrou no bloco atual e espera o escritor terminar'''
+        if self._escritor.is_alive():
+            self._enviar_bloco()
+            self._fila.put(None)
+            self._escritor.join()
+        self._verificar_erro()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _verificar_erro(self):
+        if self._erro is not None:
+            raise RuntimeError(f"falha gravando '{self.caminho}'") from self._erro
+
+    # --- THREAD ESCRITOR ---
+
+    def _escrever(self):
+        recebeu_fim = False
+        try:
+            if self.formato == 'csv':
+                arquivo = open(self.caminho, 'w', newline='', encoding='utf-8')
+            else:
+                arquivo = open(self.caminho, 'wb')
+            with arquivo:
+                escrever_bloco = self._abrir_formato(arquivo)
+                while (bloco := self._fila.get()) is not None:
+                    escrever_bloco(bloco)
+                recebeu_fim = True
+                self._fechar_formato()
+        except Exception as erro:
+            self._erro = erro
+            # esvazia a fila para o produtor nunca ficar travado num put(),
+            # a nao ser que o None do fechar() ja tenha chegado (ai ninguem mais manda nada)
+            while not recebeu_fim and self._fila.get() is not None:
+                pass
+
+    def _abrir_formato(self, arquivo):
+        self._fechar_formato = lambda: None
+
+        if self.formato == 'parquet':
+            schema = pa.schema(
+                [(nome, pa.from_numpy_dtype(tipo)) for nome, (_, tipo) in COLUNAS_LOG.items() if nome != 'Bioma']
+                + [('Bioma', pa.dictionary(pa.int8(), pa.string()))]
+            )
+            escritor = pq.ParquetWriter(arquivo, schema)
+            self._fechar_formato = escritor.close
+            nomes = pa.array(self.nomes_biomas, type=pa.string())
+
+            def escrever_bloco(bloco):
+                colunas = [pa.array(bloco[nome]) for nome in COLUNAS_LOG if nome != 'Bioma']
+                biomas = pa.array(bloco['Bioma'], mask=bloco['Bioma'] < 0)
+                colunas.append(pa.DictionaryArray.from_arrays(biomas, nomes))
+                escritor.write_table(pa.Table.from_arrays(colunas, schema=schema))
+            return escrever_bloco
+
+        if self.formato == 'binario':
+            np.save(arquivo, np.array(self.nomes_biomas, dtype=str))
+
+            def escrever_bloco(bloco):
+                np.save(arquivo, bloco)
+            return escrever_bloco
+
+        escritor_csv = csv.writer(arquivo)
+        escritor_csv.writerow(COLUNAS_LOG.keys())
+        nomes = self.nomes_biomas + ['Nenhum']  # indice -1 cai no ultimo
+
+        def escrever_bloco(bloco):
+            colunas = [bloco[nome].tolist() for nome in COLUNAS_LOG if nome != 'Bioma']
+            colunas.append([nomes[indice] for indice in bloco['Bioma'].tolist()])
+            escritor_csv.writerows(zip(*colunas))
+        return escrever_bloco
+
+
+def ler_binario(caminho: str):
+    '''
+    le um arquivo gravado no formato 'binario'
+    retorna (nomes_biomas, gerador de blocos), cada bloco é um array estruturado com as COLUNAS_LOG
+    '''
+    tamanho_arquivo = os.path.getsize(caminho)
+    arquivo = open(caminho, 'rb')
+    nomes_biomas = np.load(arquivo).tolist()
+
+    def blocos():
+        with arquivo:
+            while arquivo.tell() < tamanho_arquivo:
+                yield np.load(arquivo)
+
+    return nomes_biomas, blocos()
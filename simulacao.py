@@ -0,0 +1,672 @@
+import argparse
+import random
+import time
+import numpy as np
+from aleatorio import FluxosAleatorios
+from ambiente import Ambiente, Bioma, Cor, FonteDeRecurso, SEM_BIOMA
+from espacial import encontrar_pares, pontos_nos_circulos
+from individuos import (
+    Mutacao, ReproducaoSexuada,
+    IDADE_MAX, QTD_INICIAL_INDIVIDUOS, AMBIENTE_X_MAX, AMBIENTE_Y_MAX,
+    QTD_MAX_INDIVIDUOS, DISTANCIA_REPRODUCAO,
+    TAXA_MUTACAO, INTENSIDADE_MUTACAO, FATOR_SOBREVIVENCIA,
+
+    ENERGIA_INICIAL, ENERGIA_MAXIMA, CUSTO_MOVIMENTO, CUSTO_REPRODUCAO
+)
+from populacao import Populacao, MembrosPorBioma, ContadorIds
+from estatisticas import EstatisticasPorBioma
+from genealogia import Genealogia
+from gravacao import GravadorReplay
+from metricas import Metricas, SinkJsonl
+from registro import RegistradorColunar
+
+# --- PARAMETROS SIMULACAO ---
+INTENSIDADE_MIGRACAO = 0
+NUMERO_DE_ANOS = 4000
+IDADE_REPRODUTIVA = 10
+
+QTD_FONTES_POR_BIOMA = 1
+RAIO_FONTE_RECURSO = 45
+INTENSIDADE_MOV_RECURSO = 10
+INTENSIDADE_VARIACAO_COR = 0
+
+# o que um individuo leva quando migra para outra simulacao (id e bioma sao refeitos no destino)
+COLUNAS_MIGRANTES = ('x', 'y', 'r', 'g', 'b', 'idade', 'energia')
+
+
+class Configuracao():
+    '''
+    todos os parametros de uma rodada da simulacao num objeto só
+
+    >>> os valores padrao sao as constantes de individuos.py e deste modulo, entao
+    Configuracao() roda exatamente como antes. para variar um parametro sem editar
+    o codigo: Configuracao(taxa_mutacao=0.2) ou config.copiar(taxa_mutacao=0.2)
+    '''
+    def __init__(self, **parametros):
+        # individuos
+        self.qtd_max_individuos = QTD_MAX_INDIVIDUOS
+        self.qtd_inicial_individuos = QTD_INICIAL_INDIVIDUOS
+        self.idade_max = IDADE_MAX
+        self.taxa_mutacao = TAXA_MUTACAO
+        self.intensidade_mutacao = INTENSIDADE_MUTACAO
+        self.distancia_reproducao = DISTANCIA_REPRODUCAO
+        self.fator_sobrevivencia = FATOR_SOBREVIVENCIA
+        self.ambiente_x_max = AMBIENTE_X_MAX
+        self.ambiente_y_max = AMBIENTE_Y_MAX
+        self.energia_maxima = ENERGIA_MAXIMA
+        self.energia_inicial = ENERGIA_INICIAL
+        self.custo_movimento = CUSTO_MOVIMENTO
+        self.custo_reproducao = CUSTO_REPRODUCAO
+
+        # simulacao
+        self.intensidade_migracao = INTENSIDADE_MIGRACAO
+        self.numero_de_anos = NUMERO_DE_ANOS
+        self.idade_reprodutiva = IDADE_REPRODUTIVA
+        self.qtd_fontes_por_bioma = QTD_FONTES_POR_BIOMA
+        self.raio_fonte_recurso = RAIO_FONTE_RECURSO
+        self.intensidade_mov_recurso = INTENSIDADE_MOV_RECURSO
+        self.intensidade_variacao_cor = INTENSIDADE_VARIACAO_COR
+
+        for nome, valor in parametros.items():
+            if not hasattr(self, nome):
+                raise TypeError(f"parametro de configuracao desconhecido: '{nome}'")
+            setattr(self, nome, valor)
+
+    def copiar(self, **alteracoes) -> 'Configuracao':
+        return Configuracao(**{**vars(self), **alteracoes})
+
+    def como_dict(self) -> dict:
+        return dict(vars(self))
+
+    def __repr__(self):
+        padrao = vars(Configuracao())
+        alterados = ', '.join(f'{nome}={valor!r}' for nome, valor in vars(self).items() if padrao[nome] != valor)
+        return f'Configuracao({alterados})'
+
+
+def cria_ambiente_padrao(config: Configuracao = None) -> Ambiente:
+    ''' Cria o ambiente com os biomas padrao da simulacao, ja com os limites calculados.'''
+    config = config if config is not None else Configuracao()
+
+    polar     = Bioma('polar',     0.25, Cor(102, 183, 255), energia_fornecida=200)
+    floresta  = Bioma('floresta',  0.23, Cor(34, 139, 34), energia_fornecida=40)
+    maritimo  = Bioma('marítimo',  0.25, Cor(28, 107, 160), energia_fornecida=50)
+    desertico = Bioma('desértico', 0.27, Cor(237, 201, 175), energia_fornecida=90)
+    # savanna   = Bioma('savanna',   0.5, Cor(189, 183, 107), energia_fornecida=200)
+    # pantano   = Bioma('pântano',   0.5, Cor(47, 79, 79), energia_fornecida=200)
+    # montanha  = Bioma('montanha',  0.10, Cor(139, 137, 137), energia_fornecida=20)
+    # tundra    = Bioma('tundra',    0.5, Cor(176, 224, 230), energia_fornecida=200)
+    # planicie  = Bioma('planície',  0.10, Cor(144, 238, 144), energia_fornecida=20)
+    # vulcanico = Bioma('vulcânico', 0.10, Cor(178, 34, 34), energia_fornecida=90)
+
+    ambiente = Ambiente(
+        config.ambiente_x_max, config.ambiente_y_max,
+        [
+            maritimo, floresta, desertico, polar,
+            # savanna, pantano, montanha, tundra, planicie, vulcanico
+        ],
+        qtd_max_individuos=config.qtd_max_individuos,
+    )
+
+    ambiente._calcular_limites_biomas()
+    return ambiente
+
+
+def cria_mutacao(config: Configuracao) -> Mutacao:
+    '''Mutacao com a intensidade e a taxa do config, limitando as posicoes ao ambiente dele'''
+    return Mutacao(
+        intensidade=config.intensidade_mutacao, taxa=config.taxa_mutacao,
+        x_max=config.ambiente_x_max, y_max=config.ambiente_y_max,
+    )
+
+
+def _rng_do_bioma(rng, indice: int):
+    '''`rng` pode ser um gerador só para todos os biomas ou uma lista com um gerador por bioma'''
+    return rng[indice] if isinstance(rng, (list, tuple)) else rng
+
+
+def distribuir_fontes_de_recurso(ambiente: Ambiente, quantidade: int, rng=random, raio: int = RAIO_FONTE_RECURSO):
+    ''' Espalha `quantidade` fontes de recurso em posicoes aleatorias de cada bioma.'''
+
+    for indice, bioma in enumerate(ambiente.biomas):
+        rng_bioma = _rng_do_bioma(rng, indice)
+        for _ in range(quantidade):
+            lim = bioma.limites
+            x_rand = rng_bioma.randint(lim['x_inicio'], lim['x_fim'])
+            y_rand = rng_bioma.randint(lim['y_inicio'], lim['y_fim'])
+            fonte_obj = FonteDeRecurso(x_rand, y_rand, raio, bioma.energia_fornecida)
+            bioma.fontes_de_recurso.append(fonte_obj)
+
+
+def cria_populacao_inicial(quantidade: int, ambiente: Ambiente, rng: np.random.Generator,
+                           config: Configuracao = None, ids: ContadorIds = None) -> Populacao:
+    ''' Cria uma populacao inicial, diversificada e distribuída dentro de cada bioma.'''
+    config = config if config is not None else Configuracao()
+    ids = ids if ids is not None else ContadorIds()
+
+    qtd_por_bioma = quantidade // len(ambiente.biomas)
+    populacao = Populacao(capacidade=max(quantidade, config.qtd_max_individuos))
+
+    for indice, bioma in enumerate(ambiente.biomas):
+        limites = bioma.limites
+        populacao.adicionar(
+            x=rng.integers(limites['x_inicio'], limites['x_fim'], size=qtd_por_bioma, endpoint=True),
+            y=rng.integers(limites['y_inicio'], limites['y_fim'], size=qtd_por_bioma, endpoint=True),
+            r=rng.integers(0, 255, size=qtd_por_bioma, endpoint=True),
+            g=rng.integers(0, 255, size=qtd_por_bioma, endpoint=True),
+            b=rng.integers(0, 255, size=qtd_por_bioma, endpoint=True),
+            idade=rng.integers(0, config.idade_max, size=qtd_por_bioma, endpoint=True),
+            energia=config.energia_inicial,
+            id=ids.reservar(qtd_por_bioma),
+            bioma=indice,
+        )
+
+    return populacao
+
+
+def mover_populacao(populacao: Populacao, rng: np.random.Generator, config: Configuracao = None,
+                    linhas: np.ndarray = None, limites: tuple[int, int, int, int] = None):
+    '''
+    move a populacao inteira, ou só as `linhas` indicadas (indices) quando vier.
+    as posicoes ficam dentro de `limites` (x_min, y_min, x_max, y_max), por padrao o ambiente do config
+    '''
+    config = config if config is not None else Configuracao()
+    x_min, y_min, x_max, y_max = limites if limites is not None else (0, 0, config.ambiente_x_max, config.ambiente_y_max)
+    if linhas is None:
+        linhas = slice(None)
+        quantidade = len(populacao)
+    else:
+        quantidade = len(linhas)
+    intensidade = config.intensidade_migracao
+    mov_x = rng.integers(-intensidade, intensidade, size=quantidade, endpoint=True)
+    mov_y = rng.integers(-intensidade, intensidade, size=quantidade, endpoint=True)
+
+    populacao.x[linhas] = np.clip(populacao.x[linhas] + mov_x, x_min, x_max)
+    populacao.y[linhas] = np.clip(populacao.y[linhas] + mov_y, y_min, y_max)
+
+    populacao.energia[linhas] -= config.custo_movimento
+
+
+def alimentar_populacao(populacao: Populacao, fontes: list[FonteDeRecurso], energia_maxima: int,
+                        linhas: np.ndarray = None):
+    '''
+    envelhece um ano e alimenta a populacao inteira, ou só as `linhas` indicadas.
+    cada individuo come só da primeira fonte (na ordem da lista) que o alcança.
+    '''
+    if linhas is None:
+        linhas = slice(None)
+    populacao.idade[linhas] += 1
+
+    if not fontes:
+        return
+
+    # consulta por raio de cada fonte numa grade dos individuos: só os pares perto de verdade sao testados
+    fonte_de, alcancados = pontos_nos_circulos(
+        populacao.x[linhas], populacao.y[linhas],
+        [fonte_obj.x for fonte_obj in fontes], [fonte_obj.y for fonte_obj in fontes],
+        [fonte_obj.raio for fonte_obj in fontes],
+    )
+    # os pares vem em ordem de fonte: o primeiro par de cada individuo é a primeira fonte que o alcanca
+    ordem = np.argsort(alcancados, kind='stable')
+    alcancados, primeiro = np.unique(alcancados[ordem], return_index=True)
+    energia_fornecida = np.array([fonte_obj.energia_fornecida for fonte_obj in fontes])[fonte_de[ordem[primeiro]]]
+
+    energia = populacao.energia[linhas]
+    energia[alcancados] = np.minimum(energia[alcancados] + energia_fornecida, energia_maxima)
+    populacao.energia[linhas] = energia
+
+
+def formar_casais(populacao: Populacao, aptos: np.ndarray, rng: np.random.Generator, config: Configuracao,
+                  mutacao: Mutacao) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    embaralha os `aptos` (linhas da populacao), forma os casais pela grade e cruza todos de uma vez.
+    retorna as linhas dos pais, das maes, os genes dos filhos (n, 5) e os aptos que ficaram sem par
+    '''
+    rng.shuffle(aptos)
+    # a busca de parceiro usa uma grade espacial: cada individuo só olha as celulas vizinhas
+    pares = encontrar_pares(populacao.x[aptos].tolist(), populacao.y[aptos].tolist(), config.distancia_reproducao)
+    if not pares:
+        return aptos[:0], aptos[:0], np.empty((0, 5), dtype=np.int64), aptos
+
+    pares = np.array(pares)
+    pais, maes = aptos[pares[:, 0]], aptos[pares[:, 1]]
+    colunas = (populacao.x, populacao.y, populacao.r, populacao.g, populacao.b)
+    genes_filhos = ReproducaoSexuada.reproduzir_lote(
+        np.column_stack([coluna[pais] for coluna in colunas]),
+        np.column_stack([coluna[maes] for coluna in colunas]),
+        rng, mutacao,
+    )
+    sem_par = np.ones(len(aptos), dtype=bool)
+    sem_par[pares.ravel()] = False
+    return pais, maes, genes_filhos, aptos[sem_par]
+
+
+def reproduzir_no_bioma(populacao: Populacao, linhas: np.ndarray, limites: dict, rng: np.random.Generator,
+                        config: Configuracao, mutacao: Mutacao) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    casais e filhos só entre os aptos das `linhas` (todas de um bioma, com os `limites` dele).
+    como formar_casais, mas dos que ficaram sem par só voltam os que estao a menos de
+    distancia_reproducao da borda do bioma: sao os unicos que ainda podem achar par em outro bioma
+    '''
+    aptos = linhas[(populacao.idade[linhas] >= config.idade_reprodutiva)
+                   & (populacao.energia[linhas] >= config.custo_reproducao)]
+    pais, maes, genes_filhos, sem_par = formar_casais(populacao, aptos, rng, config, mutacao)
+
+    x, y = populacao.x[sem_par], populacao.y[sem_par]
+    distancia = config.distancia_reproducao
+    na_borda = ((x - limites['x_inicio'] < distancia) | (limites['x_fim'] - x < distancia)
+                | (y - limites['y_inicio'] < distancia) | (limites['y_fim'] - y < distancia))
+    return pais, maes, genes_filhos, sem_par[na_borda]
+
+
+def variar_cores_biomas(ambiente: Ambiente, intensidade: int, ano:int, rng=random):
+    """Altera sutilmente a cor de cada bioma a cada ano."""
+
+    if (ano // 16 == 0):
+        for indice, bioma in enumerate(ambiente.biomas):
+            rng_bioma = _rng_do_bioma(rng, indice)
+            dr = rng_bioma.randint(-intensidade, intensidade)
+            dg = rng_bioma.randint(-intensidade, intensidade)
+            db = rng_bioma.randint(-intensidade, intensidade)
+
+            bioma.cor.r = max(0, min(255, bioma.cor.r + dr))
+            bioma.cor.g = max(0, min(255, bioma.cor.g + dg))
+            bioma.cor.b = max(0, min(255, bioma.cor.b + db))
+
+
+class Simulacao():
+    '''
+    motor da simulacao, sem nenhuma dependencia do pygame
+
+    >>> guarda o ambiente, a populacao e o gerador aleatorio e avanca um ano a cada step()
+
+    quem quiser acompanhar a simulacao (a janela do pygame, um log, ...) se registra
+    como observador e é chamado ao fim de cada ano com a propria simulacao.
+
+    a populacao fica numa Populacao colunar (arrays numpy), as fases operam nela em lote.
+    quem esta em cada bioma fica em `membros` (MembrosPorBioma), atualizado pelas proprias fases.
+    os sorteios vem de `aleatorio` (FluxosAleatorios): um fluxo por fase e por bioma derivado da `semente`,
+    entao a mesma semente da a mesma trajetoria mesmo que os biomas sejam processados em outra ordem.
+
+    todos os parametros vem de `config` (Configuracao), nenhuma fase le as constantes direto.
+
+    com `metricas` (Metricas) cada ano mede o tempo das fases e conta nascimentos e mortes por causa.
+    com `genealogia` (Genealogia) cada nascimento é registrado com os ids do pai e da mae.
+    os ids vem de `ids` (ContadorIds), da propria simulacao a nao ser que outro seja passado.
+    '''
+    def __init__(self,
+                 ambiente: Ambiente = None,
+                 qtd_inicial: int = None,
+                 semente: int = None,
+                 config: Configuracao = None,
+                 metricas: Metricas = None,
+                 genealogia: Genealogia = None,
+                 ids: ContadorIds = None,
+                 ):
+        self.config = config if config is not None else Configuracao()
+
+        if qtd_inicial is None:
+            qtd_inicial = self.config.qtd_inicial_individuos
+        if ambiente is None:
+            ambiente = cria_ambiente_padrao(self.config)
+        if ambiente.biomas[0].limites is None:
+            ambiente._calcular_limites_biomas()
+        self.aleatorio = FluxosAleatorios(semente, len(ambiente.biomas))
+        if not any(bioma.fontes_de_recurso for bioma in ambiente.biomas):
+            distribuir_fontes_de_recurso(ambiente, self.config.qtd_fontes_por_bioma, self.aleatorio.escalares,
+                                         self.config.raio_fonte_recurso)
+
+        self.ambiente = ambiente
+        self.ids = ids if ids is not None else ContadorIds()
+        self.populacao = cria_populacao_inicial(qtd_inicial, ambiente, self.aleatorio.fase('inicial'), self.config,
+                                                self.ids)
+        self.mutacao = cria_mutacao(self.config)
+        self.ano = 0
+        self.observadores = []
+        self.metricas = metricas
+        self.genealogia = genealogia
+        self.limites_movimento = None     # (x_min, y_min, x_max, y_max), None = o proprio ambiente
+        self._membros = None
+
+    @property
+    def extinta(self) -> bool:
+        return len(self.populacao) == 0
+
+    def adicionar_observador(self, observador):
+        '''registra uma funcao observador(simulacao) chamada ao fim de cada ano'''
+        self.observadores.append(observador)
+
+    def step(self) -> bool:
+        '''
+        avanca um ano da simulacao
+        retorna False (sem fazer nada) se a populacao ja estiver extinta
+        '''
+        if self.extinta:
+            return False
+
+        metricas = self.metricas
+        if metricas is None:
+            for _, fase in self.fases():
+                fase()
+        else:
+            metricas.iniciar_ano()
+            for nome, fase in self.fases():
+                inicio = time.perf_counter()
+                fase()
+                metricas.tempo_fase(nome, time.perf_counter() - inicio)
+
+        self.ano += 1
+        if metricas is not None:
+            metricas.finalizar_ano(self)
+        if self.genealogia is not None:
+            self.genealogia.fim_do_ano(self.ano, self.populacao.id)
+        for observador in self.observadores:
+            observador(self)
+        return True
+
+    def run(self, n_anos: int) -> int:
+        '''roda ate n_anos (ou ate a extincao), retorna o ano em que parou'''
+        for _ in range(n_anos):
+            if not self.step():
+                break
+        return self.ano
+
+    # --- MIGRACAO ENTRE SIMULACOES (modelo de ilhas) ---
+
+    def emigrar(self, fracao: float, rng: np.random.Generator) -> dict[str, np.ndarray]:
+        '''sorteia uma fracao da populacao, tira ela daqui e devolve as colunas de quem saiu'''
+        populacao = self.populacao
+        saem = np.zeros(len(populacao), dtype=bool)
+        saem[rng.choice(len(populacao), int(round(fracao * len(populacao))), replace=False)] = True
+        migrantes = {nome: getattr(populacao, nome)[saem] for nome in COLUNAS_MIGRANTES}
+        self._compactar(~saem)
+        return migrantes
+
+    def imigrar(self, migrantes: dict[str, np.ndarray]):
+        '''
+        recebe individuos de outra simulacao (colunas de COLUNAS_MIGRANTES), na mesma posicao em que estavam.
+        sem a coluna 'id' ganham ids daqui; entram na genealogia como fundadores e o excesso sai no controle de capacidade
+        '''
+        membros = self.membros
+        biomas = self.ambiente.biomas_em_lote(migrantes['x'], migrantes['y'])
+        ids = migrantes['id'] if 'id' in migrantes else self.ids.reservar(len(biomas))
+        linhas = self.populacao.adicionar(**{nome: migrantes[nome] for nome in COLUNAS_MIGRANTES}, bioma=biomas, id=ids)
+        membros.adicionar(linhas, biomas)
+
+    # --- FASES DE UM ANO ---
+
+    @property
+    def membros(self) -> MembrosPorBioma:
+        '''linhas da populacao em cada bioma (refeitas do zero só se a populacao foi trocada por fora, ex.: checkpoint)'''
+        membros = self._membros
+        if membros is None or membros.populacao is not self.populacao or membros.tamanho != len(self.populacao):
+            membros = self._membros = MembrosPorBioma(self.populacao, len(self.ambiente.biomas))
+        return membros
+
+    def _linhas_por_bioma(self) -> list[tuple[int, np.ndarray]]:
+        '''(indice do bioma, linhas da populacao nele) para cada bioma ocupado, com SEM_BIOMA por ultimo'''
+        return self.membros.ocupados()
+
+    def _compactar(self, manter: np.ndarray):
+        '''remove os mortos da populacao e dos grupos por bioma'''
+        membros = self.membros
+        self.populacao.compactar(manter)
+        membros.compactar(manter)
+
+    def fases(self) -> list[tuple[str, callable]]:
+        '''as fases de um ano, na ordem em que step() as executa (usado tambem para medir cada uma)'''
+        return [
+            ('recursos', self._fase_recursos),
+            ('alimentacao', self._fase_alimentacao),
+            ('movimento', self._fase_movimento),
+            ('selecao', self._fase_selecao),
+            ('reproducao', self._fase_reproducao),
+            ('morte', self._fase_morte),
+        ]
+
+    def _fase_recursos(self):
+        for indice, bioma in enumerate(self.ambiente.biomas):
+            for fonte_obj in bioma.fontes_de_recurso:
+                fonte_obj.mover(bioma.limites, self.config.intensidade_mov_recurso, self.aleatorio.escalares[indice])
+        variar_cores_biomas(self.ambiente, self.config.intensidade_variacao_cor, self.ano, self.aleatorio.escalares)
+
+    def _fontes(self) -> list[FonteDeRecurso]:
+        '''todas as fontes de recurso, na ordem dos biomas'''
+        return [fonte_obj for bioma in self.ambiente.biomas for fonte_obj in bioma.fontes_de_recurso]
+
+    def _fase_alimentacao(self):
+        '''1. Envelhecer e alimentar a população'''
+        alimentar_populacao(self.populacao, self._fontes(), self.config.energia_maxima)
+
+    def _fase_movimento(self):
+        '''2. Mover a população'''
+        # cada bioma sorteia o movimento de quem esta nele (bioma do fim do ano passado)
+        membros = self.membros
+        bioma_antigo = self.populacao.bioma.copy()
+        self._mover_por_bioma(membros.ocupados())
+        membros.mover(bioma_antigo)
+
+    def _mover_por_bioma(self, grupos: list[tuple[int, np.ndarray]]):
+        for indice, linhas in grupos:
+            mover_populacao(self.populacao, self.aleatorio.bioma(indice, 'movimento'), self.config, linhas,
+                            self.limites_movimento)
+        self.populacao.bioma = self.ambiente.biomas_em_lote(self.populacao.x, self.populacao.y)
+
+    def _fase_selecao(self):
+        '''3. Seleção Natural (por cor de camuflagem)'''
+        # quem esta fora de qualquer bioma nao passa pela selecao (fica com sobrevive = False)
+        sobrevive = self._sobreviventes_por_bioma(self._linhas_por_bioma())
+
+        if self.metricas is not None:
+            fora = len(self.membros.grupos[SEM_BIOMA])
+            self.metricas.contar('mortes_fora_do_bioma', fora)
+            self.metricas.contar('mortes_selecao', len(self.populacao) - fora - np.count_nonzero(sobrevive))
+        self._compactar(sobrevive)
+
+    def _sobreviventes_por_bioma(self, grupos: list[tuple[int, np.ndarray]]) -> np.ndarray:
+        '''mascara de quem sobrevive a selecao: cor alvo = cor do bioma, cada bioma com o seu sorteio'''
+        populacao = self.populacao
+        sobrevive = np.zeros(len(populacao), dtype=bool)
+        for indice, linhas in grupos:
+            if indice == SEM_BIOMA:
+                continue
+            probabilidade_morte = self.ambiente.biomas[indice].probabilidade_morte(
+                populacao.r[linhas], populacao.g[linhas], populacao.b[linhas], self.config.fator_sobrevivencia,
+            )
+            sobrevive[linhas] = self.aleatorio.bioma(indice, 'selecao').random(len(linhas)) > probabilidade_morte
+        return sobrevive
+
+    def _fase_reproducao(self):
+        '''4. Reprodução'''
+        # cada bioma forma os seus casais com o seu sorteio; os aptos sem par perto da borda de um bioma
+        # tentam depois, todos juntos, achar par do outro lado da fronteira
+        populacao = self.populacao
+        config = self.config
+        grupos = [(indice, linhas) for indice, linhas in self._linhas_por_bioma() if indice != SEM_BIOMA]
+        resultados = self._reproduzir_por_bioma(grupos)
+
+        sobras = np.concatenate([sobra for *_, sobra in resultados]) if resultados else np.empty(0, dtype=np.int64)
+        resultados.append(formar_casais(populacao, sobras, self.aleatorio.fase('reproducao'), config, self.mutacao))
+
+        pais = np.concatenate([pais for pais, *_ in resultados])
+        if len(pais) == 0:
+            return
+        maes = np.concatenate([maes for _, maes, *_ in resultados])
+        genes_filhos = np.concatenate([genes for *_, genes, _ in resultados])
+        if self.metricas is not None:
+            self.metricas.contar('nascimentos', len(pais))
+
+        populacao.energia[pais] -= config.custo_reproducao
+        populacao.energia[maes] -= config.custo_reproducao
+
+        if self.genealogia is not None:
+            ids_pais, ids_maes = populacao.id[pais], populacao.id[maes]
+
+        membros = self.membros
+
+        xs_filhos, ys_filhos = genes_filhos[:, 0], genes_filhos[:, 1]
+        biomas_filhos = self.ambiente.biomas_em_lote(xs_filhos, ys_filhos)
+        filhos = populacao.adicionar(
+            x=xs_filhos,
+            y=ys_filhos,
+            r=genes_filhos[:, 2],
+            g=genes_filhos[:, 3],
+            b=genes_filhos[:, 4],
+            idade=0,
+            energia=config.energia_inicial,
+            id=self.ids.reservar(len(xs_filhos)),
+            bioma=biomas_filhos,
+        )
+        membros.adicionar(filhos, biomas_filhos)
+        if self.genealogia is not None:
+            # o ano em andamento (o step ainda nao incrementou self.ano)
+            self.genealogia.registrar(populacao.id[filhos], ids_pais, ids_maes, self.ano + 1, biomas_filhos)
+
+    def _reproduzir_por_bioma(self, grupos: list[tuple[int, np.ndarray]]) -> list[tuple]:
+        '''reproduzir_no_bioma para cada bioma, na ordem dos grupos'''
+        return [
+            reproduzir_no_bioma(self.populacao, linhas, self.ambiente.biomas[indice].limites,
+                                self.aleatorio.bioma(indice, 'reproducao'), self.config, self.mutacao)
+            for indice, linhas in grupos
+        ]
+
+    def _fase_morte(self):
+        '''5. Morte por idade/fome e Controle Populacional'''
+        # tudo num passe só: a mascara de vivos, a escolha de quem fica em cada bioma e no total,
+        # e uma unica compactacao no fim (os grupos por bioma já dizem quem esta em cada um)
+        populacao = self.populacao
+        grupos = self.membros.grupos
+        qtd_max_individuos = self.config.qtd_max_individuos
+        jovem = populacao.idade < self.config.idade_max
+        vivo = jovem & (populacao.energia > 0)
+        if self.metricas is not None:
+            self.metricas.contar('mortes_idade', len(populacao) - np.count_nonzero(jovem))
+            self.metricas.contar('mortes_fome', np.count_nonzero(jovem & ~vivo))
+
+        # 5.1 Controle de capacidade por bioma (quem esta fora de qualquer bioma tambem sai)
+        manter = np.zeros(len(populacao), dtype=bool)
+        for indice, bioma in enumerate(self.ambiente.biomas):
+            individuos_no_bioma = grupos[indice][vivo[grupos[indice]]]
+            if len(individuos_no_bioma) > bioma.capacidade_maxima:
+                if self.metricas is not None:
+                    self.metricas.contar('mortes_capacidade_bioma', len(individuos_no_bioma) - bioma.capacidade_maxima)
+                individuos_no_bioma = self.aleatorio.bioma(indice, 'capacidade').choice(
+                    individuos_no_bioma, bioma.capacidade_maxima, replace=False
+                )
+            manter[individuos_no_bioma] = True
+
+        # 5.2 Controle de capacidade global
+        manter = np.flatnonzero(manter)
+        if self.metricas is not None:
+            self.metricas.contar('mortes_fora_do_bioma', np.count_nonzero(vivo[grupos[SEM_BIOMA]]))
+        if len(manter) > qtd_max_individuos:
+            if self.metricas is not None:
+                self.metricas.contar('mortes_capacidade_global', len(manter) - qtd_max_individuos)
+            manter = np.sort(self.aleatorio.fase('capacidade_global').choice(manter, qtd_max_individuos, replace=False))
+
+        self._compactar(manter)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Roda a simulacao sem interface grafica.')
+    parser.add_argument('--anos', type=int, default=NUMERO_DE_ANOS)
+    parser.add_argument('--semente', type=int, default=None)
+    parser.add_argument('--intervalo-log', type=int, default=100, help='imprime a populacao a cada N anos')
+    parser.add_argument('--dados-individuais', default=None,
+                        help='grava o log por individuo nesse arquivo (.parquet, .bin ou .csv)')
+    parser.add_argument('--estatisticas', default=None, metavar='CSV',
+                        help='grava só estatisticas agregadas por ano e por bioma nesse csv (alguns MB, em vez do log por individuo)')
+    parser.add_argument('--genealogia', default=None, metavar='NPZ',
+                        help='registra pai e mae de cada nascimento e salva a tabela nesse arquivo no fim')
+    parser.add_argument('--intervalo-poda', type=int, default=100,
+                        help='a cada N anos a genealogia descarta os ramos sem descendentes vivos (0 = nunca)')
+    parser.add_argument('--gravacao', default=None, metavar='DIRETORIO',
+                        help='grava a rodada nesse diretorio para rever depois sem simular (python main.py --replay DIRETORIO)')
+    parser.add_argument('--intervalo-gravacao', type=int, default=1, help='grava 1 a cada N anos')
+    parser.add_argument('--retomar', default=None, metavar='CHECKPOINT',
+                        help='continua a partir de um checkpoint .npz (--anos passa a ser o ano final)')
+    parser.add_argument('--checkpoints', default=None, metavar='DIRETORIO',
+                        help='grava checkpoints periodicos nesse diretorio')
+    parser.add_argument('--intervalo-checkpoint', type=int, default=500)
+    parser.add_argument('--processos', type=int, default=None,
+                        help='divide as fases por bioma entre N processos (SimulacaoFragmentada)')
+    parser.add_argument('--metricas', default=None, metavar='JSONL',
+                        help='grava as metricas de cada ano (tempo por fase, nascimentos, mortes por causa...) nesse arquivo')
+    args = parser.parse_args()
+
+    # importados aqui porque checkpoint.py e fragmentos.py importam este modulo
+    from checkpoint import carregar_checkpoint, CheckpointPeriodico
+    from fragmentos import SimulacaoFragmentada
+
+    if args.retomar:
+        if args.processos:
+            simulacao = carregar_checkpoint(args.retomar, SimulacaoFragmentada, processos=args.processos)
+        else:
+            simulacao = carregar_checkpoint(args.retomar)
+        print(f'Retomando do ano {simulacao.ano} ({len(simulacao.populacao)} individuos)')
+    elif args.processos:
+        simulacao = SimulacaoFragmentada(semente=args.semente, processos=args.processos)
+    else:
+        simulacao = Simulacao(semente=args.semente)
+        if args.semente is None:
+            print(f'Semente: {simulacao.aleatorio.semente} (use --semente para repetir esta rodada)')
+
+    if args.metricas:
+        simulacao.metricas = Metricas(SinkJsonl(args.metricas))
+
+    if args.checkpoints:
+        simulacao.adicionar_observador(CheckpointPeriodico(args.checkpoints, args.intervalo_checkpoint))
+
+    registrador = None
+    if args.dados_individuais:
+        registrador = RegistradorColunar(args.dados_individuais, [bioma.nome for bioma in simulacao.ambiente.biomas])
+        simulacao.adicionar_observador(registrador)
+
+    if args.genealogia:
+        if simulacao.genealogia is None:
+            simulacao.genealogia = Genealogia(intervalo_poda=args.intervalo_poda or None)
+        else:
+            # a do checkpoint continua, com os nascimentos de antes dele
+            simulacao.genealogia.intervalo_poda = args.intervalo_poda or None
+
+    gravador = None
+    if args.gravacao:
+        gravador = GravadorReplay(args.gravacao, simulacao.ambiente, args.intervalo_gravacao)
+        gravador.registrar(simulacao.ano, simulacao.populacao, simulacao.ambiente)
+        simulacao.adicionar_observador(gravador)
+
+    estatisticas = None
+    if args.estatisticas:
+        estatisticas = EstatisticasPorBioma(args.estatisticas, [bioma.nome for bioma in simulacao.ambiente.biomas])
+        simulacao.adicionar_observador(estatisticas)
+
+    def imprimir_progresso(sim):
+        if sim.ano % args.intervalo_log == 0:
+            print(f'Ano {sim.ano}: População = {len(sim.populacao)}')
+    simulacao.adicionar_observador(imprimir_progresso)
+
+    ano_inicial = simulacao.ano
+    inicio = time.perf_counter()
+    ano_final = simulacao.run(args.anos - ano_inicial)
+    duracao = time.perf_counter() - inicio
+    if registrador is not None:
+        registrador.fechar()
+        print(f'{registrador.total_registros} registros gravados em {registrador.caminho}')
+    if estatisticas is not None:
+        estatisticas.fechar()
+        print(f'{estatisticas.total_anos} anos de estatisticas gravados em {estatisticas.caminho}')
+    if gravador is not None:
+        gravador.fechar()
+        print(f'{gravador.total_anos} anos gravados para replay em {gravador.diretorio}')
+    if simulacao.metricas is not None:
+        simulacao.metricas.fechar()
+    if args.genealogia:
+        simulacao.genealogia.salvar(args.genealogia)
+        print(f'{len(simulacao.genealogia)} nascimentos na genealogia, salva em {args.genealogia}')
+
+    if simulacao.extinta:
+        print('>>> A POPULACAO FOI EXTINTA! <<<')
+    print(f'Memoria por individuo: {Populacao.bytes_por_individuo()} bytes')
+    anos_rodados = ano_final - ano_inicial
+    print(f'{anos_rodados} anos em {duracao:.2f}s ({anos_rodados / max(duracao, 1e-9):.1f} anos/s)')
+    if isinstance(simulacao, SimulacaoFragmentada):
+        simulacao.fechar()
@@ -0,0 +1,114 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from simulacao import Simulacao, Configuracao
+
+
+def grade_de_parametros(valores_por_parametro: dict[str, list]) -> list[dict]:
+    '''produto cartesiano: {'a': [1, 2], 'b': [3]} -> [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]'''
+    nomes = list(valores_por_parametro)
+    return [dict(zip(nomes, valores)) for valores in itertools.product(*valores_por_parametro.values())]
+
+
+def executar_rodada(config: Configuracao, semente: int) -> dict:
+    '''
+    roda uma simulacao completa sem interface e resume o resultado final
+    (é a funcao que cada processo da varredura executa)
+    '''
+    inicio = time.perf_counter()
+    simulacao = Simulacao(config=config, semente=semente)
+    simulacao.run(config.numero_de_anos)
+    duracao = time.perf_counter() - inicio
+
+    populacao = simulacao.populacao
+    resumo = {
+        'semente': semente,
+        'anos_simulados': simulacao.ano,
+        'extinta': simulacao.extinta,
+        'populacao_final': len(populacao),
+        'duracao_s': round(duracao, 3),
+    }
+
+    # quao camuflada ficou a populacao de cada bioma: distancia media da cor ate a cor do bioma
+    for indice, bioma in enumerate(simulacao.ambiente.biomas):
+        no_bioma = populacao.bioma == indice
+        resumo[f'populacao_{bioma.nome}'] = int(no_bioma.sum())
+        if no_bioma.any():
+            cores = np.column_stack((populacao.r[no_bioma], populacao.g[no_bioma], populacao.b[no_bioma]))
+            distancias = np.linalg.norm(cores - [bioma.cor.r, bioma.cor.g, bioma.cor.b], axis=1)
+            resumo[f'distancia_cor_{bioma.nome}'] = round(float(distancias.mean()), 2)
+        else:
+            resumo[f'distancia_cor_{bioma.nome}'] = None
+
+    return resumo
+
+
+def varrer(valores_por_parametro: dict[str, list], sementes: list[int], base: Configuracao = None,
+           processos: int = None, ao_terminar=None) -> list[dict]:
+    '''
+    roda cada combinacao da grade de parametros com cada semente, em paralelo num pool de processos.
+    retorna um resumo por rodada, com os parametros variados na frente.
+    `ao_terminar(resumo)` é chamado a cada rodada concluida (na ordem em que terminam).
+    '''
+    base = base if base is not None else Configuracao()
+    rodadas = [
+        (parametros, semente)
+        for parametros in grade_de_parametros(valores_por_parametro)
+        for semente in sementes
+    ]
+
+    resultados = []
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = {
+            executor.submit(executar_rodada, base.copiar(**parametros), semente): parametros
+            for parametros, semente in rodadas
+        }
+        for futuro in as_completed(futuros):
+            resumo = {**futuros[futuro], **futuro.result()}
+            resultados.append(resumo)
+            if ao_terminar is not None:
+                ao_terminar(resumo)
+
+    return resultados
+
+
+def _ler_parametro(texto: str) -> tuple[str, list]:
+    '''"taxa_mutacao=0.01,0.08" -> ('taxa_mutacao', [0.01, 0.08]), com o tipo do valor padrao'''
+    nome, valores = texto.split('=', 1)
+    padrao = getattr(Configuracao(), nome)
+    return nome, [type(padrao)(valor) for valor in valores.split(',')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Varredura de parametros em paralelo, sem interface grafica.')
+    parser.add_argument('--param', action='append', default=[], metavar='NOME=V1,V2,...',
+                        help='parametro da Configuracao e os valores a testar (pode repetir)')
+    parser.add_argument('--sementes', type=int, default=3, help='quantas sementes por combinacao')
+    parser.add_argument('--anos', type=int, default=None)
+    parser.add_argument('--processos', type=int, default=os.cpu_count())
+    parser.add_argument('--saida', default='resultados_varredura.csv')
+    args = parser.parse_args()
+
+    valores_por_parametro = dict(_ler_parametro(texto) for texto in args.param)
+    base = Configuracao() if args.anos is None else Configuracao(numero_de_anos=args.anos)
+    total = len(grade_de_parametros(valores_por_parametro)) * args.sementes
+
+    concluidas = 0
+
+    def mostrar_progresso(resumo: dict):
+        global concluidas
+        concluidas += 1
+        print(f'[{concluidas}/{total}] {resumo}')
+
+    resultados = varrer(valores_por_parametro, list(range(args.sementes)), base, args.processos, mostrar_progresso)
+
+    colunas = list(dict.fromkeys(coluna for resumo in resultados for coluna in resumo))
+    with open(args.saida, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=colunas)
+        escritor.writeheader()
+        escritor.writerows(resultados)
+    print(f'{len(resultados)} rodadas salvas em {args.saida}')